@@ -0,0 +1,152 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+"""
+
+REST Access Log
+===============
+
+When the option 'access_log' of the section '[base_rest]' of the server config
+file gives the path of a file, a json line is appended to this file for each
+call to a REST service. The records are built by the ``RestController`` only
+when the access log is enabled and are written by a background thread, so the
+requests never wait for the disk.
+
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+
+from odoo.tools.config import config
+
+from .http import get_json_codec
+
+_logger = logging.getLogger(__name__)
+
+# headers whose value is never written into the access log
+DEFAULT_REDACTED_HEADERS = "Api-Key,Authorization,Cookie"
+REDACTED = "<redacted>"
+
+
+class AccessLogWriter(object):
+    """Append the records of the access log to a file as json lines.
+
+    The records are put into a bounded queue and written by a daemon thread.
+    If the queue is full (the disk can't keep up), the records are dropped
+    and counted rather than slowing down the requests.
+    """
+
+    max_queue_size = 10000
+    # max number of records written at once
+    max_batch_size = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self.pid = os.getpid()
+        self.dropped = 0
+        self._queue = queue.Queue(self.max_queue_size)
+        self._thread = threading.Thread(
+            target=self._run, name="base_rest.access_log", daemon=True
+        )
+        self._thread.start()
+
+    def log(self, record):
+        """Queue a record (a dict) to write into the access log"""
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self, timeout=None):
+        """Write the queued records and stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        codec = get_json_codec()
+        stopped = False
+        while not stopped:
+            records = [self._queue.get()]
+            while len(records) < self.max_batch_size:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in records:
+                stopped = True
+                records = [r for r in records if r is not None]
+            if not records:
+                continue
+            try:
+                # the file is reopened for each batch to follow the rotation
+                # of the log files
+                with open(self.path, "ab") as f:
+                    f.write(b"".join(codec.dumps(r) + b"\n" for r in records))
+            except Exception:
+                _logger.exception("Unable to write the REST access log")
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_access_log_writer():
+    """
+    Return the writer of the access log or None if the access log is not
+    enabled. A writer is started by process (the writer thread of the parent
+    process doesn't survive a fork).
+    :return: an AccessLogWriter or None
+    """
+    global _writer
+    path = config.get_misc("base_rest", "access_log")
+    if not path:
+        return None
+    writer = _writer
+    if writer is None or writer.path != path or writer.pid != os.getpid():
+        with _writer_lock:
+            writer = _writer
+            if writer is None or writer.path != path or writer.pid != os.getpid():
+                writer = _writer = AccessLogWriter(path)
+    return writer
+
+
+@atexit.register
+def _stop_access_log_writer():
+    writer = _writer
+    if writer is not None and writer.pid == os.getpid():
+        writer.stop(timeout=5)
+
+
+_redacted_headers = {}
+
+
+def get_redacted_headers():
+    """Return the (lower case) names of the headers redacted into the access
+    log as given by the option 'access_log_redacted_headers' of the section
+    '[base_rest]' of the server config file"""
+    value = config.get_misc(
+        "base_rest", "access_log_redacted_headers", DEFAULT_REDACTED_HEADERS
+    )
+    names = _redacted_headers.get(value)
+    if names is None:
+        names = _redacted_headers[value] = frozenset(
+            name.strip().lower() for name in value.split(",") if name.strip()
+        )
+    return names
+
+
+def redact_headers(headers, redacted=None):
+    """
+    Return the headers as a dict where the value of the redacted headers is
+    replaced.
+    :param headers: an iterable of (name, value)
+    :param redacted: names (lower case) of the headers to redact. By default,
+                     the headers given by ``get_redacted_headers``
+    :return: dict
+    """
+    if redacted is None:
+        redacted = get_redacted_headers()
+    return {
+        name: REDACTED if name.lower() in redacted else value for name, value in headers
+    }
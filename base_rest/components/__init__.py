@@ -1 +1,2 @@
 from . import service
+from . import pagination
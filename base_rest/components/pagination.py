@@ -0,0 +1,159 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import base64
+import datetime
+import json
+
+from odoo import fields
+from odoo.exceptions import UserError
+from odoo.osv import expression
+from odoo.tools.translate import _
+
+from odoo.addons.component.core import AbstractComponent
+
+from .service import to_int
+
+
+class KeysetPagination(AbstractComponent):
+    """Keyset (cursor) pagination for the search methods of the services.
+
+    Unlike a pagination by offset, the records of the next page are found by
+    a domain on the sort key of the last record of the current page. The cost
+    of a page therefore doesn't depend of its position. The position of the
+    next page is returned to the client as an opaque cursor.
+
+    .. code-block:: python
+
+        class PartnerService(Component):
+            _inherit = ["base.rest.service", "base.rest.keyset.pagination"]
+
+            def search(self, name, limit, cursor=None):
+                domain = [("name", "ilike", name)]
+                partners, next_cursor = self._paginate(
+                    "res.partner", domain, limit, cursor
+                )
+                return {
+                    "rows": [self._to_json(p) for p in partners],
+                    "next_cursor": next_cursor,
+                }
+
+            def _validator_search(self):
+                res = {"name": {"type": "string", "required": True}}
+                res.update(self._get_pagination_schema())
+                return res
+
+            def _validator_return_search(self):
+                res = {"rows": {...}}
+                res.update(self._get_pagination_return_schema())
+                return res
+    """
+
+    _name = "base.rest.keyset.pagination"
+
+    _pagination_default_limit = 20
+    _pagination_max_limit = 100
+
+    def _get_pagination_schema(self):
+        """Return the fields of the input schema of a paginated method"""
+        return {
+            "limit": {
+                "type": "integer",
+                "coerce": to_int,
+                "default": self._pagination_default_limit,
+                "min": 1,
+                "max": self._pagination_max_limit,
+            },
+            "cursor": {"type": "string", "nullable": True},
+        }
+
+    def _get_pagination_return_schema(self):
+        """Return the fields of the output schema of a paginated method"""
+        return {"next_cursor": {"type": "string", "nullable": True}}
+
+    def _encode_cursor(self, values):
+        data = json.dumps(values, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(data).decode("ascii")
+
+    def _decode_cursor(self, cursor, length):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        except ValueError:
+            values = None
+        if (
+            not isinstance(values, list)
+            or len(values) != length
+            or not isinstance(values[-1], int)
+        ):
+            raise UserError(_("Invalid cursor %s") % cursor)
+        return values
+
+    def _get_cursor_value(self, record, field_name):
+        value = record[field_name]
+        if isinstance(value, datetime.datetime):
+            return fields.Datetime.to_string(value)
+        if isinstance(value, datetime.date):
+            return fields.Date.to_string(value)
+        return value
+
+    def _check_sort_field(self, model, sort_field):
+        """The records are ordered by the value of a many2one or of a
+        translated field in the comodel or in the translations, while the
+        keyset domain compares the value of the column: only the other
+        stored fields can be used as sort field"""
+        field = model._fields.get(sort_field)
+        if (
+            field is None
+            or not field.store
+            or not field.column_type
+            or field.type in ("many2one", "reference")
+            or field.translate
+        ):
+            raise ValueError(
+                "%s.%s can't be used as sort field of a keyset pagination"
+                % (model._name, sort_field)
+            )
+
+    def _paginate(self, model_name, domain, limit, cursor=None, sort_field=None):
+        """
+        Return the records of the page following the given cursor and the
+        cursor of the next page.
+
+        The records are sorted by id or by ``sort_field`` then id. The sort
+        field must be a stored scalar field (not relational nor translated)
+        without null values.
+        :param model_name:
+        :param domain:
+        :param limit: size of the page
+        :param cursor: cursor returned with the previous page or None for the
+                       first page
+        :param sort_field:
+        :return: a tuple (records, next cursor). The next cursor is None if
+                 this page is the last one.
+        """
+        model = self.env[model_name]
+        if sort_field:
+            self._check_sort_field(model, sort_field)
+        if cursor:
+            if sort_field:
+                value, last_id = self._decode_cursor(cursor, 2)
+                keyset_domain = expression.OR(
+                    [
+                        [(sort_field, ">", value)],
+                        [(sort_field, "=", value), ("id", ">", last_id)],
+                    ]
+                )
+            else:
+                (last_id,) = self._decode_cursor(cursor, 1)
+                keyset_domain = [("id", ">", last_id)]
+            domain = expression.AND([domain, keyset_domain])
+        order = "%s, id" % sort_field if sort_field else "id"
+        records = model.search(domain, limit=limit + 1, order=order)
+        if len(records) <= limit:
+            return records, None
+        records = records[:limit]
+        last = records[-1]
+        values = [last.id]
+        if sort_field:
+            values.insert(0, self._get_cursor_value(last, sort_field))
+        return records, self._encode_cursor(values)
@@ -2,21 +2,31 @@
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
 
+import hashlib
 import inspect
 import logging
+import random
 import textwrap
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
 
 from werkzeug.exceptions import NotFound
+from werkzeug.http import http_date
 
 from odoo.exceptions import UserError, ValidationError
 from odoo.http import request
+from odoo.osv import expression
+from odoo.tools.config import config
 from odoo.tools.translate import _
 
 from odoo.addons.component.core import AbstractComponent
 
 from ..core import _rest_services_databases
+from ..metrics import get_metrics
+from ..sql_tracking import QueryTracker, get_repeat_threshold, is_sql_tracking_enabled
+from ..timing import get_phase_timer
 from ..tools import cerberus_to_json
+from ..validator import ThreadLocalValidator, compile_validator
 
 _logger = logging.getLogger(__name__)
 
@@ -61,11 +71,234 @@ def skip_secure_response(func):
     return func
 
 
+def batched(func=None, batch_size=None):
+    """
+    Used to decorate the methods returning an unbounded number of rows.
+    The method reads the records by batches of ``batch_size`` records with
+    ``_search_batched`` (the batch size being returned by
+    ``_get_batch_size``). If the method returns an iterator of rows instead
+    of a dict, the rows are streamed to the client.
+
+    .. code-block:: python
+
+        @batched(batch_size=200)
+        def search(self, name):
+            records = self._search_batched(
+                "res.partner", [("name", "ilike", name)],
+                batch_size=self._get_batch_size("search"),
+            )
+            ...
+
+    :param func:
+    :param batch_size: number of records read at once
+    :return:
+    """
+
+    def decorator(func):
+        func.batched = {"batch_size": batch_size}
+        return func
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def cache_control(max_age=0, public=False, vary=("Accept-Language",), records=None):
+    """
+    Used to decorate the methods called by HTTP GET to declare how their
+    response can be cached by the clients and the proxies.
+
+    .. code-block:: python
+
+        @cache_control(max_age=60, records="_get")
+        def get(self, _id):
+            return self._to_json(self._get(_id))
+
+    :param max_age: value of the max-age directive of the Cache-Control header
+    :param public: True if the response can be stored by the shared caches
+    :param vary: names of the headers to put into the Vary header
+    :param records: name of a method of the service returning the records
+                    involved into the response. This method is called with the
+                    same parameters as the decorated method. An ETag and a
+                    Last-Modified header are computed from the write_date of
+                    these records and the client gets a '304 Not Modified'
+                    response if its copy of the response is still valid.
+    :return:
+    """
+
+    def decorator(func):
+        func.cache_control = {
+            "max_age": max_age,
+            "public": public,
+            "vary": tuple(vary or ()),
+            "records": records,
+        }
+        return func
+
+    return decorator
+
+
+def parse_output_validation(policy):
+    """
+    Parse a policy of validation of the output of the services.
+    :param policy: 'always' (default), 'sample:N' or 'off'
+    :return: a tuple (mode, rate)
+    """
+    mode, __, rate = (policy or "always").strip().partition(":")
+    if mode in ("always", "off") and not rate:
+        return mode, 1
+    if mode == "sample" and rate.isdigit() and int(rate) > 0:
+        return mode, int(rate)
+    raise ValueError("Invalid output validation policy %r" % policy)
+
+
+def output_validation(policy):
+    """
+    Used to decorate methods to specify how their output is validated.
+
+    * ``always``: the output is validated and sanitized by the output schema
+      of the method. An invalid output raises an error.
+    * ``sample:N``: the output of one call out of N is validated. An invalid
+      output is logged and counted but returned as is to the client. The
+      output is never sanitized.
+    * ``off``: only the shape of the output is checked (a dict containing the
+      required keys of the output schema).
+
+    .. code-block:: python
+
+        @output_validation("sample:100")
+        def search(self, name):
+            ...
+
+    :param policy:
+    :return:
+    """
+    parse_output_validation(policy)
+
+    def decorator(func):
+        func.output_validation = policy
+        return func
+
+    return decorator
+
+
+def _get_error_paths(errors, path=()):
+    """Flatten the errors of a validator into a list of 'path: message'"""
+    res = []
+    if isinstance(errors, dict):
+        for key, value in errors.items():
+            res += _get_error_paths(value, path + (str(key),))
+    elif isinstance(errors, (list, tuple)):
+        for value in errors:
+            res += _get_error_paths(value, path)
+    else:
+        res.append("%s: %s" % (".".join(path), errors))
+    return res
+
+
+class StreamedRows(object):
+    """
+    Result of a service method returning its rows as an iterator.
+
+    When a method of a service returns an instance of this class, the json
+    document is serialized row by row instead of being built in memory as
+    python objects. The rows are validated one by one against the schema of
+    the items of the ``rows_key`` field of the output schema of the method.
+
+    If ``rows`` is an iterable, the rows are read with the environment of the
+    request and serialized while the request is processed. To stream the rows
+    to the client, ``rows`` must be a function taking an environment and
+    returning the rows: the function is called once the request is processed,
+    with an environment on a cursor opened for the response, and the rows are
+    sent to the client while they are read.
+
+    .. code-block:: python
+
+        def search(self, name):
+            domain = [("name", "ilike", name)]
+
+            def rows(env):
+                partners = env["res.partner"].search(domain)
+                return (self._to_json(p) for p in partners)
+
+            count = self.env["res.partner"].search_count(domain)
+            return StreamedRows(rows, count=count)
+
+    :param rows: an iterable of dict or a function returning it for a given
+                 environment
+    :param rows_key: the name of the field containing the rows into the json
+                     document
+    :param envelope: the other fields of the json document
+    """
+
+    def __init__(self, rows, rows_key="rows", **envelope):
+        self.rows = rows
+        self.rows_key = rows_key
+        self.envelope = envelope
+
+    @property
+    def is_deferred(self):
+        """Whether the rows are read with their own environment"""
+        return callable(self.rows)
+
+    def iter_rows(self, env):
+        """Return the iterator of the rows, read with the given environment
+        if the rows are deferred"""
+        if self.is_deferred:
+            return iter(self.rows(env))
+        return iter(self.rows)
+
+    def map_rows(self, func, **envelope):
+        """Return a ``StreamedRows`` with the same key whose rows are given
+        by ``func(rows)`` and whose envelope is the given one"""
+        rows = self.rows
+        if self.is_deferred:
+            return StreamedRows(
+                lambda env: func(rows(env)), rows_key=self.rows_key, **envelope
+            )
+        return StreamedRows(func(rows), rows_key=self.rows_key, **envelope)
+
+    def to_dict(self, env):
+        """Return the whole json document as a dict. This consumes the rows
+        and loads them in memory."""
+        res = dict(self.envelope)
+        res[self.rows_key] = list(self.iter_rows(env))
+        return res
+
+
+ServiceMethod = namedtuple(
+    "ServiceMethod",
+    [
+        "name",
+        "function",
+        "skip_secure_params",
+        "skip_secure_response",
+        "input_validator",
+        "output_validator",
+        "batched",
+        "cache_control",
+        "output_validation",
+    ],
+)
+ServiceMethod.__doc__ = """Public method of a REST service as registered into
+the dispatch table of the service. ``function`` is the unbound function
+implementing the method. ``batched`` and ``cache_control`` hold the options
+given to the decorators of the same name or None. ``output_validation`` is
+the policy of validation of the output as a tuple (mode, rate). The
+validators are None unless the service declares its schemas static."""
+
+
 class BaseRestService(AbstractComponent):
     _name = "base.rest.service"
 
     _desciption = None  # sdescription included into the openapi doc
     _is_rest_service_component = True  # marker to retrieve REST components
+    # default number of records read at once by _search_batched
+    _batch_size = 500
+    # the validators of the service are only built once and cached if its
+    # validation schemas are static (they don't depend on the env, the
+    # context, the user, the request or the work context)
+    _static_validators = False
 
     def _prepare_extra_log(self, func, params, secure_params, res):
         httprequest = request.httprequest
@@ -83,14 +316,26 @@ class BaseRestService(AbstractComponent):
 
     def _log_call(self, func, params, secure_params, res):
         """If you want to enjoy the advanced log install the module
-        logging_json"""
-        if request:
+        logging_json. For an access log of the calls, see
+        ``odoo.addons.base_rest.access_log``"""
+        if request and _logger.isEnabledFor(logging.DEBUG):
             httprequest = request.httprequest
             extra = self._prepare_extra_log(func, params, secure_params, res)
             args = [httprequest.url, httprequest.method]
             message = "REST call url %s method %s"
             _logger.debug(message, *args, extra=extra)
 
+    def _warn_once(self, key, message, *args):
+        """Log a warning only once by service and key until the registry of
+        the REST services is rebuilt"""
+        services_registry = _rest_services_databases.get(self.env.cr.dbname)
+        if services_registry is not None:
+            key = (self._name,) + tuple(key)
+            if key in services_registry.logged_warnings:
+                return
+            services_registry.logged_warnings.add(key)
+        _logger.warning(message, *args)
+
     def _get_validator(self, validator_method):
         if not hasattr(self, validator_method):
             return None
@@ -99,11 +344,41 @@ class BaseRestService(AbstractComponent):
             return Validator(v, purge_unknown=True)
         return v
 
+    def _get_cached_validator(self, method_name, direction):
+        """
+        Return the validator to use for the given method and direction
+        ('input' or 'output'). If the service declares its schemas static
+        (``_static_validators``), the validators are cached into the registry
+        of the REST services of the database so the validation schema is
+        only built and checked once by method. When possible, the schema is
+        compiled into python functions (see :func:`compile_validator`).
+        :param method_name:
+        :param direction: 'input' or 'output'
+        :return: a validator or None if no schema is defined
+        """
+        if direction == "input":
+            validator_method = "_validator_%s" % method_name
+        else:
+            validator_method = "_validator_return_%s" % method_name
+        services_registry = _rest_services_databases.get(self.env.cr.dbname)
+        if services_registry is None or not self._static_validators:
+            return self._get_validator(validator_method)
+        validators = services_registry.validators
+        key = (self._name, method_name, direction)
+        if key not in validators:
+            validator = self._get_validator(validator_method)
+            if isinstance(validator, Validator):
+                validator = compile_validator(validator) or ThreadLocalValidator(
+                    validator
+                )
+            validators[key] = validator
+        return validators[key]
+
     def _get_input_validator(self, method_name):
-        return self._get_validator("_validator_%s" % method_name)
+        return self._get_cached_validator(method_name, "input")
 
     def _get_output_validator(self, method_name):
-        return self._get_validator("_validator_return_%s" % method_name)
+        return self._get_cached_validator(method_name, "output")
 
     def _get_input_schema(self, method_name):
         validator = self._get_input_validator(method_name)
@@ -130,9 +405,17 @@ class BaseRestService(AbstractComponent):
         :return:
         """
         method_name = method.__name__
-        if hasattr(method, "skip_secure_params"):
+        service_method = self._get_dispatch_table().get(method_name)
+        if service_method:
+            if service_method.skip_secure_params:
+                return params
+            v = service_method.input_validator
+            if not self._static_validators:
+                v = self._get_input_validator(method_name)
+        elif hasattr(method, "skip_secure_params"):
             return params
-        v = self._get_input_validator(method_name)
+        else:
+            v = self._get_input_validator(method_name)
         if v is None:
             raise ValidationError(
                 _("No input schema defined for method %s in service %s")
@@ -156,20 +439,167 @@ class BaseRestService(AbstractComponent):
         method_name = method
         if callable(method):
             method_name = method.__name__
-        if hasattr(method, "skip_secure_response"):
+        service_method = self._get_dispatch_table().get(method_name)
+        mode, rate = "always", 1
+        if service_method:
+            if service_method.skip_secure_response:
+                return response
+            v = service_method.output_validator
+            if not self._static_validators:
+                v = self._get_output_validator(method_name)
+            mode, rate = service_method.output_validation
+        elif hasattr(method, "skip_secure_response"):
             return response
-        v = self._get_output_validator(method_name)
+        else:
+            v = self._get_output_validator(method_name)
         if not v:
-            _logger.warning(
+            self._warn_once(
+                ("no_output_schema", method_name),
                 "DEPRECATED: You must define an output schema for method %s "
                 "in service %s",
                 method_name,
                 self._name,
             )
             return response
+        if mode == "off" or (mode == "sample" and random.randrange(rate)):
+            return self._check_output_shape(v, response)
+        strict = mode == "always"
+        if isinstance(response, StreamedRows):
+            return self._secure_streamed_output(method_name, v, response, strict)
         if v.validate(response):
-            return v.document
-        raise SystemError(_("Invalid Response %s") % v.errors)
+            return v.document if strict else response
+        if strict:
+            raise SystemError(_("Invalid Response %s") % v.errors)
+        self._output_validation_failed(method_name, v.errors)
+        return response
+
+    def _check_output_shape(self, validator, response):
+        """
+        Check the shape of a response which is not validated: the response
+        must be a dict containing the required keys of the output schema.
+        """
+        document = response
+        if isinstance(response, StreamedRows):
+            document = dict.fromkeys([response.rows_key], [])
+            document.update(response.envelope)
+        if not isinstance(document, dict):
+            raise SystemError(_("Invalid Response %s") % type(document))
+        missing = [
+            key
+            for key, rules in validator.schema.items()
+            if key not in document and rules.get("required")
+        ]
+        if missing:
+            raise SystemError(
+                _("Invalid Response, missing keys %s") % ", ".join(missing)
+            )
+        return response
+
+    def _output_validation_failed(self, method_name, errors):
+        """Log and count an invalid response of a method whose output is
+        validated by sampling. The invalid responses are counted into the
+        metrics (if enabled)."""
+        metrics = get_metrics()
+        if metrics is not None:
+            try:
+                metrics.observe_output_validation_failure(
+                    self._collection, self._usage, method_name
+                )
+            except Exception:
+                _logger.exception("Unable to count the invalid response")
+        _logger.warning(
+            "Invalid response of method %s in service %s: %s",
+            method_name,
+            self._name,
+            "; ".join(_get_error_paths(errors)),
+        )
+
+    def _get_output_validation(self, policy=None):
+        """
+        Return the policy of validation of the output of a method as a tuple
+        (mode, rate). The policy given to the decorator ``output_validation``
+        takes precedence over the option 'output_validation.<collection>'
+        then the option 'output_validation' of the section '[base_rest]' of
+        the server config file.
+        :param policy: the policy given to the decorator or None
+        :return:
+        """
+        if policy is None and self._collection:
+            policy = config.get_misc(
+                "base_rest", "output_validation.%s" % self._collection
+            )
+        if policy is None:
+            policy = config.get_misc("base_rest", "output_validation")
+        try:
+            return parse_output_validation(policy)
+        except ValueError:
+            _logger.error(
+                "Invalid output validation policy %r for service %s, the "
+                "output is always validated",
+                policy,
+                self._name,
+            )
+            return "always", 1
+
+    def _secure_streamed_output(self, method_name, validator, response, strict=True):
+        """
+        Validate the envelope of a streamed response and wrap its rows into
+        a generator validating each row. If not ``strict``, the invalid
+        envelope and rows are logged and returned as is.
+        """
+        rows_key = response.rows_key
+        envelope = dict(response.envelope)
+        envelope[rows_key] = []
+        if validator.validate(envelope):
+            if strict:
+                envelope = validator.document
+        elif strict:
+            raise SystemError(_("Invalid Response %s") % validator.errors)
+        else:
+            self._output_validation_failed(method_name, validator.errors)
+        envelope.pop(rows_key, None)
+        row_validator = self._get_output_row_validator(method_name, rows_key)
+        if row_validator is None:
+            return response.map_rows(lambda rows: rows, **envelope)
+        return response.map_rows(
+            lambda rows: self._secure_rows(row_validator, rows, strict, method_name),
+            **envelope
+        )
+
+    def _secure_rows(self, validator, rows, strict=True, method_name=None):
+        for row in rows:
+            if validator.validate(row):
+                yield validator.document if strict else row
+            elif strict:
+                raise SystemError(_("Invalid Response %s") % validator.errors)
+            else:
+                self._output_validation_failed(method_name, validator.errors)
+                yield row
+
+    def _get_output_row_validator(self, method_name, rows_key="rows"):
+        """
+        Return the validator of the rows of a streamed response. It's built
+        from the rules of the items of the field ``rows_key`` of the output
+        schema of the method. As the other validators, it's only cached if
+        the service declares its schemas static.
+        :return: a validator or None if the items have no schema
+        """
+        services_registry = _rest_services_databases.get(self.env.cr.dbname)
+        validators = {}
+        if services_registry is not None and self._static_validators:
+            validators = services_registry.validators
+        key = (self._name, method_name, "output_row", rows_key)
+        if key not in validators:
+            validator = None
+            schema = self._get_output_schema(method_name) or {}
+            item_rules = schema.get(rows_key, {}).get("schema", {})
+            if item_rules.get("type") == "dict" and "schema" in item_rules:
+                validator = Validator(item_rules["schema"], purge_unknown=True)
+                validator = compile_validator(validator) or ThreadLocalValidator(
+                    validator
+                )
+            validators[key] = validator
+        return validators[key]
 
     def dispatch(self, method_name, _id=None, params=None):
         """
@@ -184,21 +614,197 @@ class BaseRestService(AbstractComponent):
                        to the method as keyword args.
         :return:
         """
-        params = params or {}
-        if not self._is_public_api_method(method_name):
+        secure_params = self._secure_dispatch_params(method_name, _id, params)
+        return self._dispatch_secured(method_name, secure_params, params)
+
+    def _get_service_method(self, method_name):
+        service_method = self._get_dispatch_table().get(method_name)
+        if service_method is None:
             _logger.warning(
                 "Method %s is not a public method of service %s",
                 method_name,
                 self._name,
             )
             raise NotFound()
-        func = getattr(self, method_name, None)
-        secure_params = self._secure_input(func, params)
+        return service_method
+
+    def _secure_dispatch_params(self, method_name, _id=None, params=None):
+        """
+        Return the parameters of the given method once secured by
+        ``_secure_input`` (with the _id if any).
+        :param method_name:
+        :param _id:
+        :param params:
+        :return: the keyword args of the method
+        """
+        service_method = self._get_service_method(method_name)
+        func = service_method.function.__get__(self, self.__class__)
+        with get_phase_timer().phase("input"):
+            secure_params = self._secure_input(func, params or {})
         if _id:
             secure_params["_id"] = _id
-        res = func(**secure_params)
-        self._log_call(func, params, secure_params, res)
-        return self._secure_output(func, res)
+        return secure_params
+
+    def _dispatch_secured(self, method_name, secure_params, params=None):
+        """
+        Call the given method with the parameters already secured by
+        ``_secure_dispatch_params`` and secure its result.
+        :param method_name:
+        :param secure_params: the keyword args of the method
+        :param params: the parameters received by the service (logged)
+        :return:
+        """
+        service_method = self._get_service_method(method_name)
+        func = service_method.function.__get__(self, self.__class__)
+        timer = get_phase_timer()
+        with timer.phase("method"), self._track_queries(method_name):
+            if service_method.batched is not None:
+                res = func(**secure_params)
+                if not isinstance(res, (dict, StreamedRows)):
+                    res = StreamedRows(res)
+            else:
+                res = func(**secure_params)
+        self._log_call(func, params or {}, secure_params, res)
+        with timer.phase("output"):
+            return self._secure_output(func, res)
+
+    @contextmanager
+    def _track_queries(self, method_name):
+        """
+        Count the SQL queries executed into this context if the SQL tracking
+        is enabled. The number of queries and their duration are added to the
+        'sql' phase of the request and a warning is logged for the statements
+        repeated more than the threshold (N+1 queries).
+        """
+        if not is_sql_tracking_enabled():
+            yield None
+            return
+        with QueryTracker(self.env.cr) as tracker:
+            yield tracker
+        get_phase_timer().add("sql", tracker.duration, tracker.count)
+        threshold = get_repeat_threshold()
+        for statement, count, duration in tracker.get_repeated(threshold):
+            self._warn_once(
+                ("repeated_query", method_name, statement),
+                "Method %s of service %s executed %d times (%.1f ms) the query: %s",
+                method_name,
+                self._name,
+                count,
+                duration * 1000,
+                statement,
+            )
+
+    def _get_cache_headers(self, method_name, secure_params):
+        """
+        Return the cache headers of the response of the given method as
+        declared with the ``cache_control`` decorator. If the records involved
+        into the response are declared, the ETag and Last-Modified headers are
+        computed from their write_date without calling the method.
+        :param method_name:
+        :param secure_params: the keyword args of the method as returned by
+                              ``_secure_dispatch_params``
+        :return: a dict of headers or None if the method doesn't declare any
+                 cache policy
+        """
+        service_method = self._get_dispatch_table().get(method_name)
+        if not service_method or not service_method.cache_control:
+            return None
+        policy = service_method.cache_control
+        directives = ["public" if policy["public"] else "private"]
+        directives.append("max-age=%d" % policy["max_age"])
+        headers = {"Cache-Control": ", ".join(directives)}
+        if policy["vary"]:
+            headers["Vary"] = ", ".join(policy["vary"])
+        if policy["records"]:
+            records = getattr(self, policy["records"])(**secure_params)
+            headers.update(self._get_records_cache_validators(records, method_name))
+        return headers
+
+    def _get_records_cache_validators(self, records, method_name):
+        """Return the ETag and Last-Modified headers computed from the
+        write_date of the given records. The ETag is weak since the same
+        response can be sent compressed or not."""
+        write_dates = records.mapped("write_date")
+        key = [
+            self._name,
+            method_name,
+            self.env.uid,
+            self.env.context.get("lang"),
+            records._name,
+            records.ids,
+            [str(write_date) for write_date in write_dates],
+        ]
+        etag = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        headers = {"ETag": 'W/"%s"' % etag}
+        write_dates = [write_date for write_date in write_dates if write_date]
+        if write_dates:
+            headers["Last-Modified"] = http_date(max(write_dates))
+        return headers
+
+    def _get_batch_size(self, method_name):
+        """
+        Return the number of records to read at once by ``_search_batched``
+        for the given method: the batch size given to its ``batched``
+        decorator or ``_batch_size``.
+        :param method_name:
+        :return: int
+        """
+        service_method = self._get_dispatch_table().get(method_name)
+        batched = service_method and service_method.batched
+        return (batched and batched.get("batch_size")) or self._batch_size
+
+    def _search_batched(
+        self, model_name, domain, fields=None, batch_size=None, env=None
+    ):
+        """
+        Iterate over the records matching the domain by batches of
+        ``batch_size`` records ordered by id. The records of a batch are
+        read at once and the cache of the environment is invalidated between
+        two batches so the memory used doesn't depend of the number of
+        records found.
+        :param model_name:
+        :param domain:
+        :param fields: if given, the values of these fields are read for each
+                       batch and yielded as dict (as returned by ``read``).
+                       Otherwise the records are yielded once their
+                       prefetched fields are read for the whole batch.
+        :param batch_size: number of records by batch (``_batch_size`` by
+                           default), see ``_get_batch_size``.
+        :param env: the environment to read the records with (the one of the
+                    service by default), see ``StreamedRows``
+        :return: a generator
+        """
+        model = (env or self.env)[model_name]
+        batch_size = batch_size or self._batch_size
+        if fields is None:
+            # the fields prefetched by the ORM, read at once for each batch
+            prefetch_fields = [
+                name
+                for name, field in model._fields.items()
+                if field.prefetch
+                and not (field.groups and not model.user_has_groups(field.groups))
+                and not (field.compute and model.env.field_todo(field))
+            ]
+        last_id = 0
+        while True:
+            records = model.search(
+                expression.AND([domain, [("id", ">", last_id)]]),
+                limit=batch_size,
+                order="id",
+            )
+            if not records:
+                return
+            if fields is not None:
+                for row in records.read(fields):
+                    yield row
+            else:
+                records.read(prefetch_fields, load="_classic_write")
+                for record in records:
+                    yield record
+            last_id = records[-1].id
+            model.invalidate_cache()
+            if len(records) < batch_size:
+                return
 
     def _validator_delete(self):
         """
@@ -282,13 +888,54 @@ class BaseRestService(AbstractComponent):
             return False
         return True
 
-    def _get_openapi_paths(self):  # noqa: C901
-        paths = OrderedDict()
-        public_methods = {}
-        for name, data in inspect.getmembers(self, inspect.ismethod):
+    def _get_dispatch_table(self):
+        """
+        Return the public methods of the service as a dict method name ->
+        ``ServiceMethod``. The dispatch table is computed once by component
+        and cached into the registry of the REST services of the database.
+        :return: dict
+        """
+        services_registry = _rest_services_databases.get(self.env.cr.dbname)
+        if services_registry is None:
+            return self._build_dispatch_table()
+        dispatch_tables = services_registry.dispatch_tables
+        dispatch_table = dispatch_tables.get(self._name)
+        if dispatch_table is None:
+            dispatch_table = self._build_dispatch_table()
+            dispatch_tables[self._name] = dispatch_table
+        return dispatch_table
+
+    def _build_dispatch_table(self):
+        static_validators = self._static_validators
+        dispatch_table = OrderedDict()
+        for name, method in inspect.getmembers(self, inspect.ismethod):
             if not self._is_public_api_method(name):
                 continue
-            public_methods[name] = data
+            dispatch_table[name] = ServiceMethod(
+                name=name,
+                function=method.__func__,
+                skip_secure_params=hasattr(method, "skip_secure_params"),
+                skip_secure_response=hasattr(method, "skip_secure_response"),
+                input_validator=(
+                    self._get_input_validator(name) if static_validators else None
+                ),
+                output_validator=(
+                    self._get_output_validator(name) if static_validators else None
+                ),
+                batched=getattr(method, "batched", None),
+                cache_control=getattr(method, "cache_control", None),
+                output_validation=self._get_output_validation(
+                    getattr(method, "output_validation", None)
+                ),
+            )
+        return dispatch_table
+
+    def _get_openapi_paths(self):  # noqa: C901
+        paths = OrderedDict()
+        public_methods = OrderedDict(
+            (name, service_method.function.__get__(self, self.__class__))
+            for name, service_method in self._get_dispatch_table().items()
+        )
 
         for name, method in list(public_methods.items()):
             id_in_path_required = False
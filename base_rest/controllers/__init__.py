@@ -4,3 +4,4 @@
 
 from . import main
 from . import api_docs
+from . import metrics
@@ -1,20 +1,23 @@
 # Copyright 2018 ACSONE SA/NV
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
-import json
+import hashlib
 from contextlib import contextmanager
 
-from odoo.http import Controller, request, route
+from werkzeug.exceptions import NotFound, ServiceUnavailable
+
+from odoo.http import Controller, Response, request, route
 
 from odoo.addons.component.core import WorkContext
 
-from ..core import _rest_services_databases
+from ..core import _rest_services_databases, get_service_usages
+from ..http import get_json_codec
 from .main import _PseudoCollection
 
 
 class ApiDocsController(Controller):
     def make_json_response(self, data, headers=None, cookies=None):
-        data = json.dumps(data)
+        data = get_json_codec().dumps(data)
         if headers is None:
             headers = {}
         headers["Content-Type"] = "application/json"
@@ -34,8 +37,45 @@ class ApiDocsController(Controller):
 
     @route("/api-docs/<path:collection>/<string:service_name>.json", auth="public")
     def api(self, collection, service_name):
-        with self.service_component(collection, service_name) as service:
-            return self.make_json_response(service.to_openapi())
+        body, etag = self._get_openapi_doc(collection, service_name)
+        headers = {"ETag": '"%s"' % etag}
+        if request.httprequest.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
+        headers["Content-Type"] = "application/json"
+        return request.make_response(body, headers=headers)
+
+    def _get_openapi_cache_key(self, collection_name, service_name):
+        base_url = request.env["ir.config_parameter"].sudo().get_param("web.base.url")
+        return (
+            collection_name,
+            service_name,
+            request.env.context.get("lang"),
+            base_url,
+        )
+
+    def _get_openapi_doc(self, collection, service_name):
+        """
+        Return the OpenAPI document of the requested service as a tuple
+        (json body, etag). The documents are cached into the registry of the
+        REST services of the database and are therefore generated again
+        when this registry is rebuilt. The collections are only known once
+        this registry is built: a 503 is returned until then.
+        :param collection:
+        :param service_name:
+        :return: tuple
+        """
+        services_registry = _rest_services_databases.get(request.env.cr.dbname)
+        if services_registry is None:
+            raise ServiceUnavailable()
+        collection_name = self._get_collection_name(collection)
+        key = self._get_openapi_cache_key(collection_name, service_name)
+        openapi_docs = services_registry.openapi_docs
+        doc = openapi_docs.get(key)
+        if doc is None:
+            with self.service_component(collection, service_name) as service:
+                body = get_json_codec().dumps(service.to_openapi())
+            doc = openapi_docs[key] = (body, hashlib.sha1(body).hexdigest())
+        return doc
 
     def _get_api_urls(self):
         """
@@ -59,18 +99,12 @@ class ApiDocsController(Controller):
         api_urls = sorted(api_urls, key=lambda k: k["name"])
         return api_urls
 
-    def _filter_service_components(self, components):
-        r = []
-        for c in components:
-            if hasattr(c, "_is_rest_service_component") and c._usage:
-                r.append(c)
-        return r
-
     def _get_service_in_collection(self, collection_name):
         with self.work_on_component(collection_name) as work:
             components = work.components_registry.lookup(collection_name)
-            services = self._filter_service_components(components)
-            services = [work.component(usage=s._usage) for s in services]
+            services = [
+                work.component(usage=usage) for usage in get_service_usages(components)
+            ]
         return services
 
     @contextmanager
@@ -99,5 +133,10 @@ class ApiDocsController(Controller):
         yield WorkContext(model_name="rest.service.registration", collection=collection)
 
     def _get_collection_name(self, name):
-        services_registry = _rest_services_databases.get(request.env.cr.dbname, {})
-        return services_registry["/" + name + "/"]["collection_name"]
+        services_registry = _rest_services_databases.get(request.env.cr.dbname)
+        if services_registry is None:
+            raise ServiceUnavailable()
+        spec = services_registry.get("/" + name + "/")
+        if spec is None:
+            raise NotFound()
+        return spec["collection_name"]
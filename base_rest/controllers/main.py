@@ -3,20 +3,72 @@
 
 import inspect
 import logging
+import re
+import time
+from collections import OrderedDict
 from contextlib import contextmanager
 from urllib.parse import urljoin
 
-from werkzeug.exceptions import BadRequest
+from werkzeug.exceptions import BadRequest, Forbidden, NotFound
+from werkzeug.http import parse_date, unquote_etag
 
 from odoo.http import Controller, ControllerType, Response, request, route
 
 from odoo.addons.component.core import WorkContext, _get_addon_name
 
-from ..core import _rest_controllers_per_module
+from ..access_log import get_access_log_writer, redact_headers
+from ..components.service import StreamedRows
+from ..core import (
+    _rest_controllers_per_module,
+    _rest_services_databases,
+    get_service_usages,
+)
+from ..http import (
+    compress_response,
+    get_exception_json,
+    get_http_exception,
+    negotiate_content_encoding,
+)
+from ..metrics import get_metrics
+from ..sql_tracking import ModifiedTablesTracker
+from ..timing import get_phase_timer, is_server_timing_enabled
 
 _logger = logging.getLogger(__name__)
 
 
+# Routes resolved by the catch-all route of a RestController by HTTP method
+# and kind of the path segments following the service name (int for an id,
+# str for a method name or the literal value of the segment). The value is
+# the name of the default route handling the same path.
+_REST_PATHS = {
+    ("GET", ()): "get",
+    ("GET", ("search",)): "get",
+    ("GET", (int,)): "get",
+    ("GET", (int, "get")): "get",
+    ("POST", ()): "modify",
+    ("POST", (str,)): "modify",
+    ("POST", (int,)): "modify",
+    ("POST", (int, str)): "modify",
+    ("PUT", (int,)): "update",
+    ("DELETE", (int,)): "delete",
+}
+
+_INT_SEGMENT_RE = re.compile(r"[0-9]+\Z")
+
+# service and method labels of the metrics of the calls to an unknown service
+# or method
+_UNKNOWN_LABEL = "_unknown"
+
+# HTTP method of the default route calling a method of a service (POST for
+# the other methods), used to check the auth of the operations of a batch
+_METHOD_HTTP_METHODS = {
+    "get": "GET",
+    "search": "GET",
+    "update": "PUT",
+    "delete": "DELETE",
+}
+
+
 class _PseudoCollection(object):
     __slots__ = "_name", "env"
 
@@ -50,9 +102,43 @@ class RestControllerType(ControllerType):
                 {"root_path": root_path, "collection_name": collection_name}
             )
 
+    @staticmethod
+    def _get_member(bases, members, name):
+        if name in members:
+            return members[name]
+        for base in bases:
+            if hasattr(base, name):
+                return getattr(base, name)
+        return None
+
+    @classmethod
+    def _add_catch_all_methods(cls, bases, members):
+        """Add one route by root path (and by authentication) dispatching
+        all the calls to the services of the controller"""
+        default_auth = cls._get_member(bases, members, "_default_auth")
+        auth_by_method = cls._get_member(bases, members, "_auth_by_method") or {}
+        methods_by_auth = OrderedDict()
+        for http_method in ("GET", "POST", "PUT", "DELETE"):
+            auth = auth_by_method.get(http_method, default_auth)
+            methods_by_auth.setdefault(auth, []).append(http_method)
+        for i, (auth, methods) in enumerate(methods_by_auth.items()):
+            name = "rest_dispatch" if not i else "rest_dispatch_%d" % i
+            members[name] = cls._make_catch_all_method(methods, auth)
+
+    @staticmethod
+    def _make_catch_all_method(methods, auth):
+        @route(["<path:_rest_path>"], methods=methods, auth=auth)
+        def rest_dispatch(self, _rest_path, **params):
+            return self._dispatch_rest_path(_rest_path, params)
+
+        return rest_dispatch
+
     @classmethod
     def _add_default_methods(cls, bases, members):
         if "RestController" in globals() and RestController in bases:
+            if cls._get_member(bases, members, "_routing_mode") == "catch_all":
+                cls._add_catch_all_methods(bases, members)
+                return
 
             @route(
                 [
@@ -96,8 +182,18 @@ class RestControllerType(ControllerType):
             def delete(self, _service_name, _id):
                 return self._process_method(_service_name, "delete", _id)
 
+            @route(["_batch"], methods=["POST"])
+            def batch(self, operations=None, **params):
+                return self._process_batch(operations)
+
             members.update(
-                {"get": get, "modify": modify, "update": update, "delete": delete}
+                {
+                    "get": get,
+                    "modify": modify,
+                    "update": update,
+                    "delete": delete,
+                    "batch": batch,
+                }
             )
 
     @classmethod
@@ -165,6 +261,19 @@ class RestController(Controller, metaclass=RestControllerType):
     _cors = None
     # Whether CSRF protection should be enabled for the route.
     _csrf = False
+    # By default ('rules'), a route is registered for each kind of path
+    # (<service>, <service>/<int:id>, ...). With the 'catch_all' mode, a single
+    # route is registered for the root path and the service, the method and
+    # the id are resolved by the controller.
+    _routing_mode = "rules"
+    # The maximum number of operations processed by a call to the batch route
+    _batch_max_operations = 100
+    # The json responses are compressed (gzip or deflate) if the client
+    # accepts it and if the size of the body is at least this number of
+    # bytes. Set it to None to disable the compression.
+    _compression_min_size = 1024
+    # The compression level (1-9)
+    _compression_level = 6
 
     def _get_component_context(self):
         """
@@ -178,8 +287,25 @@ class RestController(Controller, metaclass=RestControllerType):
         if isinstance(data, Response):
             # The response has been build by the called method...
             return data
-        # By default return result as json
-        return request.make_json_response(data)
+        if isinstance(data, StreamedRows):
+            response = request.make_json_stream_response(data)
+        else:
+            # By default return result as json
+            response = request.make_json_response(data)
+        return self._compress_response(response)
+
+    def _compress_response(self, response):
+        if self._compression_min_size is None:
+            return response
+        encoding = negotiate_content_encoding(request.httprequest)
+        if not encoding:
+            return response
+        return compress_response(
+            response,
+            encoding,
+            level=self._compression_level,
+            min_size=self._compression_min_size,
+        )
 
     @property
     def collection_name(self):
@@ -225,8 +351,353 @@ class RestController(Controller, metaclass=RestControllerType):
             raise BadRequest()
         return True
 
+    def _dispatch_rest_path(self, rest_path, params):
+        """Process a call received by the catch-all route. ``rest_path`` is the
+        part of the path following the root path."""
+        http_method = request.httprequest.method
+        segments = rest_path.split("/")
+        if http_method == "POST" and segments == ["_batch"]:
+            return self._process_batch(params.get("operations"))
+        handler, service_name, _id, name = self._resolve_rest_path(
+            http_method, segments
+        )
+        if service_name not in self._get_service_usages():
+            raise NotFound()
+        if handler == "get":
+            method_name = "get" if _id else "search"
+        elif handler == "modify":
+            method_name = name
+            if not method_name:
+                method_name = "update" if _id else "create"
+            if method_name == "get":
+                _logger.error(
+                    "HTTP POST with method name 'get' is not allowed. "
+                    "(service name: %s)",
+                    service_name,
+                )
+                raise BadRequest()
+        elif handler == "delete":
+            return self._process_method(service_name, "delete", _id)
+        else:
+            method_name = handler
+        return self._process_method(service_name, method_name, _id, params)
+
+    def _resolve_rest_path(self, http_method, segments):
+        """
+        Resolve the path of a call received by the catch-all route as the
+        default routes do.
+        :param http_method:
+        :param segments: the segments of the path following the root path
+        :return: a tuple (name of the default route handling the path, service
+                 name, id, method name given into the path)
+        """
+        service_name, segments = segments[0], segments[1:]
+        if not service_name or not all(segments):
+            raise NotFound()
+        kinds = tuple(int if _INT_SEGMENT_RE.match(s) else s for s in segments)
+        handler = _REST_PATHS.get((http_method, kinds))
+        if handler is None:
+            generic_kinds = tuple(int if k is int else str for k in kinds)
+            handler = _REST_PATHS.get((http_method, generic_kinds))
+        if handler is None:
+            raise NotFound()
+        _id = None
+        name = None
+        for segment, kind in zip(segments, kinds):
+            if kind is int:
+                _id = int(segment)
+            elif handler == "modify":
+                name = segment
+        return handler, service_name, _id, name
+
+    def _get_service_usages(self):
+        """Return the usages of the services of the collection, filled into
+        the registry of the REST services when it's built"""
+        services_registry = _rest_services_databases.get(request.db)
+        service_usages = services_registry.service_usages if services_registry else {}
+        usages = service_usages.get(self.collection_name)
+        if usages is None:
+            with self.work_on_component() as work:
+                components = work.components_registry.lookup(self.collection_name)
+            usages = service_usages[self.collection_name] = frozenset(
+                get_service_usages(components)
+            )
+        return usages
+
     def _process_method(self, service_name, method_name, _id=None, params=None):
-        self._validate_method_name(method_name)
-        with self.service_component(service_name) as service:
-            result = service.dispatch(method_name, _id, params)
-            return self.make_response(result)
+        timer = get_phase_timer()
+        with self._monitor_call(service_name, method_name, _id) as record:
+            self._validate_method_name(method_name)
+            with self.service_component(service_name) as service:
+                service._get_service_method(method_name)
+                if record is not None:
+                    # the names given by the url are known
+                    record["resolved"] = True
+                cache_headers = None
+                if request.httprequest.method == "GET":
+                    secure_params = service._secure_dispatch_params(
+                        method_name, _id, params
+                    )
+                    with timer.phase("cache"):
+                        cache_headers = self._get_cache_headers(
+                            service, method_name, secure_params
+                        )
+                    if cache_headers and self._is_not_modified(cache_headers):
+                        response = Response(status=304, headers=cache_headers)
+                        return self._add_server_timing(response, record)
+                    result = service._dispatch_secured(
+                        method_name, secure_params, params
+                    )
+                else:
+                    result = service.dispatch(method_name, _id, params)
+                with timer.phase("response"):
+                    response = self._make_method_response(result, cache_headers)
+                return self._add_server_timing(response, record)
+
+    def _get_cache_headers(self, service, method_name, secure_params):
+        """Return the cache headers of the response of a method of a service
+        (see ``BaseRestService._get_cache_headers``)"""
+        headers = service._get_cache_headers(method_name, secure_params)
+        if headers and self._compression_min_size is not None:
+            # the response may be compressed according to the Accept-Encoding
+            # header of the request
+            vary = headers.get("Vary")
+            headers["Vary"] = (
+                "%s, Accept-Encoding" % vary if vary else "Accept-Encoding"
+            )
+        return headers
+
+    def _add_server_timing(self, response, record=None):
+        """Return the timings of the phases of the request into the
+        Server-Timing header of the response (if enabled) and into the
+        record of the call (if any, see ``_monitor_call``)"""
+        if record is not None:
+            record["status"] = response.status_code
+        timer = get_phase_timer()
+        if not timer.enabled:
+            return response
+        if is_server_timing_enabled():
+            response.headers["Server-Timing"] = timer.to_header()
+        if record is not None:
+            record["phases"] = timer.as_ms()
+            if "sql" in timer.counts:
+                record["sql_queries"] = timer.counts["sql"]
+        return response
+
+    def _make_method_response(self, result, cache_headers=None):
+        response = self.make_response(result)
+        if cache_headers:
+            for key, value in cache_headers.items():
+                if key == "Vary":
+                    # keep the Vary header set by the compression
+                    for header in value.split(","):
+                        response.vary.add(header.strip())
+                else:
+                    response.headers[key] = value
+        return response
+
+    @contextmanager
+    def _monitor_call(self, service_name, method_name, _id=None, resolved=False):
+        """
+        Count the call processed into this context into the metrics and
+        write a record into the access log. The record is yielded to let the
+        caller add its own values (status, timings, ...). Nothing is done
+        (and None is yielded) if neither the access log nor the metrics are
+        enabled.
+
+        The names of the service and the method come from the url: they are
+        only used as labels of the metrics once the caller has resolved them
+        (``resolved`` or ``record["resolved"]`` set to True), the other calls
+        are counted under the ``_UNKNOWN_LABEL`` so the slots of the metrics
+        can't be exhausted by unknown paths.
+        """
+        writer = get_access_log_writer()
+        metrics = get_metrics()
+        if writer is None and metrics is None:
+            yield None
+            return
+        record = {
+            "service": service_name,
+            "method": method_name,
+            "id": _id,
+            "resolved": resolved,
+        }
+        started = time.perf_counter()
+        status = 500
+        try:
+            yield record
+            status = 200
+        except Exception as e:
+            status = get_http_exception(e)[0].code
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            record.setdefault("status", status)
+            if not record.pop("resolved"):
+                service_name = method_name = _UNKNOWN_LABEL
+            try:
+                if metrics is not None:
+                    timer = get_phase_timer()
+                    metrics.observe(
+                        self.collection_name,
+                        service_name,
+                        method_name,
+                        record["status"],
+                        duration,
+                        sql_count=timer.counts.get("sql", 0),
+                        sql_duration=timer.phases.get("sql", 0.0),
+                    )
+                if writer is not None:
+                    record["duration_ms"] = round(duration * 1000, 3)
+                    writer.log(self._prepare_access_log_record(record))
+            except Exception:
+                _logger.exception("Unable to record the call")
+
+    def _prepare_access_log_record(self, record):
+        """Complete the record of the access log with the request values"""
+        httprequest = request.httprequest
+        res = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "db": request.db,
+            "uid": request.uid,
+            "collection": self.collection_name,
+            "http_method": httprequest.method,
+            "path": httprequest.path,
+            "remote_addr": httprequest.remote_addr,
+            "headers": redact_headers(httprequest.headers.items()),
+        }
+        res.update(record)
+        return res
+
+    def _is_not_modified(self, cache_headers):
+        """
+        Return True if the copy of the response owned by the client is still
+        valid according to the If-None-Match and If-Modified-Since headers of
+        the request.
+        """
+        httprequest = request.httprequest
+        etag = cache_headers.get("ETag")
+        if httprequest.if_none_match:
+            # weak comparison (RFC 7232)
+            return bool(etag) and httprequest.if_none_match.contains_weak(
+                unquote_etag(etag)[0]
+            )
+        last_modified = cache_headers.get("Last-Modified")
+        if_modified_since = httprequest.if_modified_since
+        if last_modified and if_modified_since:
+            return parse_date(last_modified) <= if_modified_since
+        return False
+
+    def _process_batch(self, operations):
+        """
+        Process a list of operations in a single request. Each operation is
+        a dict with the keys 'service', 'method', 'id' and 'params' and is
+        processed into its own savepoint. The response is a list with for
+        each operation a dict with the http status of the operation and its
+        result or error.
+        """
+        if not isinstance(operations, list):
+            raise BadRequest("A list of operations is expected")
+        if len(operations) > self._batch_max_operations:
+            raise BadRequest(
+                "Too many operations (max %d)" % self._batch_max_operations
+            )
+        with self._monitor_call("_batch", "batch", resolved=True) as record:
+            results = [self._process_batch_operation(op) for op in operations]
+            if record is not None:
+                record["operations"] = len(results)
+            with get_phase_timer().phase("response"):
+                response = self.make_response(results)
+            return self._add_server_timing(response, record)
+
+    def _get_auth(self, http_method):
+        """Return the auth of the default routes for the given HTTP method"""
+        return self._auth_by_method.get(http_method, self._default_auth)
+
+    def _check_batch_operation_auth(self, method_name):
+        """
+        Check that the method can be called by a batch operation. The batch
+        route is authenticated as a POST, so a method called through another
+        HTTP method by the default routes is rejected if its auth differs.
+        :param method_name:
+        """
+        http_method = _METHOD_HTTP_METHODS.get(method_name, "POST")
+        if self._get_auth(http_method) != self._get_auth("POST"):
+            raise Forbidden("The method %s can't be called in a batch" % method_name)
+
+    @contextmanager
+    def _batch_operation_savepoint(self):
+        """
+        Process an operation of a batch into a savepoint. When the operation
+        fails, the savepoint is rolled back and the cache of the models
+        modified by the operation is invalidated. The cache and the pending
+        recomputations of the previous operations are kept.
+        """
+        env = request.env
+        todo = {field: list(recs) for field, recs in env.all.todo.items()}
+        with ModifiedTablesTracker(env.cr) as tracker:
+            try:
+                with env.cr.savepoint():
+                    yield
+            except Exception:
+                env.all.todo.clear()
+                env.all.todo.update(todo)
+                self._invalidate_tables(tracker.tables)
+                raise
+
+    def _invalidate_tables(self, tables):
+        """Invalidate the cache of the fields which values may come from the
+        given tables"""
+        if not tables:
+            return
+        env = request.env
+        spec = []
+        for model in env.registry.values():
+            if model._abstract:
+                continue
+            modified = model._table in tables
+            for field in model._fields.values():
+                if (
+                    modified
+                    or not field.store
+                    or field.type == "many2many"
+                    and field.relation in tables
+                    or field.type == "one2many"
+                    and env[field.comodel_name]._table in tables
+                ):
+                    spec.append((field, None))
+        env.cache.invalidate(spec)
+
+    def _process_batch_operation(self, operation):
+        try:
+            if not isinstance(operation, dict) or not operation.get("service"):
+                raise BadRequest("Invalid operation %s" % operation)
+            _id = operation.get("id")
+            if _id is not None and (
+                isinstance(_id, bool) or not isinstance(_id, int) or _id <= 0
+            ):
+                raise BadRequest("Invalid id %s" % (_id,))
+            method_name = operation.get("method") or ("get" if _id else "search")
+            params = operation.get("params") or {}
+            self._validate_method_name(method_name)
+            self._check_batch_operation_auth(method_name)
+            with self._batch_operation_savepoint():
+                with self.service_component(operation["service"]) as service:
+                    result = service.dispatch(method_name, _id, params)
+                    if isinstance(result, StreamedRows):
+                        result = result.to_dict(request.env)
+                    elif isinstance(result, Response):
+                        raise BadRequest(
+                            "The method %s can't be called in a batch" % method_name
+                        )
+            return {"status": 200, "result": result}
+        except Exception as e:
+            http_exception, include_description = get_http_exception(e)
+            if http_exception.code < 500:
+                _logger.info("Batch operation %s failed: %s", operation, e)
+            else:
+                _logger.exception("Batch operation %s failed", operation)
+            return {
+                "status": http_exception.code,
+                "error": get_exception_json(http_exception, include_description),
+            }
@@ -0,0 +1,35 @@
+# Copyright 2018 ACSONE SA/NV
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import hmac
+
+from werkzeug.exceptions import Forbidden, NotFound
+
+from odoo.http import Controller, request, route
+from odoo.tools.config import config
+
+from ..metrics import get_metrics
+
+
+class MetricsController(Controller):
+    @route("/base_rest/metrics", methods=["GET"], type="http", auth="none")
+    def metrics(self, **params):
+        """Return the metrics of the REST services in the Prometheus text
+        format. The token given by the option 'metrics_token' of the section
+        '[base_rest]' must be given into an 'Authorization: Bearer' header.
+        The metrics are never returned if no token is set.
+        """
+        metrics = get_metrics()
+        if metrics is None:
+            raise NotFound()
+        token = config.get_misc("base_rest", "metrics_token")
+        if not token:
+            raise Forbidden()
+        authorization = request.httprequest.headers.get("Authorization", "")
+        expected = "Bearer %s" % token
+        if not hmac.compare_digest(authorization.encode(), expected.encode()):
+            raise Forbidden()
+        return request.make_response(
+            metrics.render_text(),
+            headers=[("Content-Type", "text/plain; version=0.0.4; charset=utf-8")],
+        )
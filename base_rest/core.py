@@ -3,6 +3,8 @@
 
 import collections
 
+from odoo.tools.lru import LRU
+
 
 class RestServicesDatabases(dict):
     """ Holds a registry of REST services for each database """
@@ -13,8 +15,91 @@ _rest_services_databases = RestServicesDatabases()
 _rest_controllers_per_module = collections.defaultdict(list)
 
 
+def get_service_usages(components):
+    """Return the usages of the REST services among the given components (in
+    the order of the components, without duplicates)"""
+    usages = []
+    for component in components:
+        if (
+            getattr(component, "_is_rest_service_component", False)
+            and component._usage
+            and component._usage not in usages
+        ):
+            usages.append(component._usage)
+    return usages
+
+
+class RootPathTrie(object):
+    """Prefix tree of the root paths of the REST services. It gives the
+    longest root path prefixing a path in a single walk of the path."""
+
+    __slots__ = ("_root",)
+
+    def __init__(self, root_paths=()):
+        self._root = {}
+        for root_path in root_paths:
+            node = self._root
+            for char in root_path:
+                node = node.setdefault(char, {})
+            # None can't be a char, it marks the end of a root path
+            node[None] = root_path
+
+    def match(self, path):
+        """Return the longest root path prefixing the given path or None"""
+        node = self._root
+        found = None
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                break
+            found = node.get(None, found)
+        return found
+
+
 class RestServicesRegistry(dict):
     """ Holds a registry of REST services where key is the root of the path on
     which the methods of your ` RestController`` are registred and value is the
     name of the collection on which your ``RestServiceComponent`` implementing
     the business logic of your service is registered."""
+
+    def __init__(self, *args, **kwargs):
+        super(RestServicesRegistry, self).__init__(*args, **kwargs)
+        # Validators of the services methods by (component name, method name,
+        # direction). The cache is filled when the registry is built and is
+        # dropped with the registry when this one is rebuilt.
+        self.validators = {}
+        # Public methods of the services by component name. For each
+        # component, a dict method name -> ``ServiceMethod``. Filled when the
+        # registry is built or at the first call to a service.
+        self.dispatch_tables = {}
+        # Generated OpenAPI documents by (collection name, usage, lang,
+        # base url). Values are tuples (json body, etag).
+        self.openapi_docs = {}
+        # Installed languages as a tuple (result of res.lang.get_installed(),
+        # set of locales, locales by language) and LRU cache of the locales
+        # by value of the Accept-Language header. Both are rebuilt when the
+        # installed languages change.
+        self.installed_locales = None
+        self.accept_language_cache = LRU(512)
+        self._root_paths_trie = None
+        # Usages of the REST services by collection name
+        self.service_usages = {}
+        # Keys of the warnings already logged (see BaseRestService._warn_once)
+        self.logged_warnings = set()
+
+    def __setitem__(self, key, value):
+        super(RestServicesRegistry, self).__setitem__(key, value)
+        self._root_paths_trie = None
+
+    def __delitem__(self, key):
+        super(RestServicesRegistry, self).__delitem__(key)
+        self._root_paths_trie = None
+
+    def match_root_path(self, path):
+        """Return the root path of the REST services handling the given path
+        or None"""
+        trie = self._root_paths_trie
+        if trie is None:
+            # the new trie is published once fully built
+            trie = self._root_paths_trie = RootPathTrie(list(self))
+        return trie.match(path)
@@ -3,11 +3,17 @@
 # @author Sébastien BEAU <sebastien.beau@akretion.com>
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
+import atexit
 import datetime
+import decimal
 import json
 import logging
+import re
 import sys
+import threading
+import time
 import traceback
+import zlib
 from collections import defaultdict
 
 from werkzeug.exceptions import (
@@ -16,10 +22,13 @@ from werkzeug.exceptions import (
     HTTPException,
     InternalServerError,
     NotFound,
+    RequestEntityTooLarge,
     Unauthorized,
 )
 from werkzeug.utils import escape
 
+import odoo
+from odoo import SUPERUSER_ID, api
 from odoo.exceptions import (
     AccessDenied,
     AccessError,
@@ -27,11 +36,18 @@ from odoo.exceptions import (
     UserError,
     ValidationError,
 )
-from odoo.http import HttpRequest, Root, SessionExpiredException, request
+from odoo.http import (
+    HttpRequest,
+    Response,
+    Root,
+    SessionExpiredException,
+    request,
+)
 from odoo.tools import ustr
 from odoo.tools.config import config
 
 from .core import _rest_services_databases
+from .timing import new_phase_timer
 
 _logger = logging.getLogger(__name__)
 
@@ -41,14 +57,247 @@ try:
 except (ImportError, IOError) as err:
     _logger.debug(err)
 
+try:
+    import orjson
+except (ImportError, IOError) as err:
+    orjson = None
+    _logger.debug(err)
+
+
+def _json_default(obj):
+    """Serialize the python types not supported by the json encoders"""
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8")
+    raise TypeError(
+        "Object of type %s is not JSON serializable" % obj.__class__.__name__
+    )
+
 
 class JSONEncoder(json.JSONEncoder):
     def default(self, obj):  # pylint: disable=E0202,arguments-differ
-        if isinstance(obj, datetime.datetime):
-            return obj.isoformat()
-        elif isinstance(obj, datetime.date):
-            return obj.isoformat()
-        return super(JSONEncoder, self).default(obj)
+        try:
+            return _json_default(obj)
+        except TypeError:
+            return super(JSONEncoder, self).default(obj)
+
+
+class JSONCodec(object):
+    """Codec used to parse the json body of the requests and to serialize
+    the json responses. This one relies on the json module of the standard
+    library."""
+
+    name = "json"
+
+    def __init__(self):
+        self._encoder = JSONEncoder()
+
+    def loads(self, data):
+        """Parse a json document given as bytes or str"""
+        return json.loads(data)
+
+    def dumps(self, obj):
+        """Serialize obj as a json document encoded in utf-8 (bytes)"""
+        return self._encoder.encode(obj).encode("utf-8")
+
+
+class OrjsonCodec(JSONCodec):
+    """Codec relying on the orjson library.
+
+    The documents not supported by orjson are given to the json module so
+    they are handled as by the ``JSONCodec``: the integers wider than 64 bits,
+    the ``NaN`` and ``Infinity`` literals of a parsed document, the strings
+    with lone surrogates or the dict keys of other types than str, int,
+    float, bool or None. The remaining differences are that orjson
+    serializes NaN and Infinity as null (and not as the invalid json
+    literals written by the json module), the datetimes natively and
+    without spaces between the items.
+    """
+
+    name = "orjson"
+
+    # the numbers with more digits than a 64 bits integer are parsed as
+    # floats by orjson, not as integers
+    _long_number_re = re.compile(r"\d{19,}")
+    _long_number_bytes_re = re.compile(rb"\d{19,}")
+
+    def loads(self, data):
+        if isinstance(data, str):
+            long_number = self._long_number_re.search(data)
+        else:
+            long_number = self._long_number_bytes_re.search(data)
+        if not long_number:
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                pass
+        return super(OrjsonCodec, self).loads(data)
+
+    def dumps(self, obj):
+        try:
+            return orjson.dumps(
+                obj, default=_json_default, option=orjson.OPT_NON_STR_KEYS
+            )
+        except orjson.JSONEncodeError:
+            return super(OrjsonCodec, self).dumps(obj)
+
+
+JSON_CODECS = {JSONCodec.name: JSONCodec, OrjsonCodec.name: OrjsonCodec}
+
+_json_codecs = {}
+
+
+def get_json_codec():
+    """
+    Return the codec to use to parse and serialize json documents. The codec
+    is selected by the option 'json_codec' of the section '[base_rest]' of the
+    server config file:
+
+    * 'auto' (default): orjson if the library is installed, json otherwise
+    * 'orjson'
+    * 'json'
+    :return: a JSONCodec instance
+    """
+    name = config.get_misc("base_rest", "json_codec", "auto")
+    codec = _json_codecs.get(name)
+    if codec is None:
+        codec_name = name
+        if codec_name == "auto":
+            codec_name = OrjsonCodec.name if orjson else JSONCodec.name
+        elif codec_name == OrjsonCodec.name and not orjson:
+            _logger.warning(
+                "The json codec orjson is configured but the library orjson is "
+                "not installed. The json module is used instead."
+            )
+            codec_name = JSONCodec.name
+        elif codec_name not in JSON_CODECS:
+            _logger.warning(
+                "Unknown json codec %s. The json module is used instead.", name
+            )
+            codec_name = JSONCodec.name
+        codec = _json_codecs[name] = JSON_CODECS[codec_name]()
+    return codec
+
+
+def get_http_exception(exception):
+    """
+    Return the werkzeug HTTPException to use to render the given exception
+    raised by a REST service.
+    :param exception:
+    :return: a tuple (HTTPException, include_description). include_description
+             is True if the description of the exception can be returned to
+             the client.
+    """
+    if isinstance(exception, (UserError, ValidationError)):
+        return BadRequest(exception.name), True
+    if isinstance(exception, MissingError):
+        return NotFound(ustr(exception)), False
+    if isinstance(exception, (AccessError, AccessDenied)):
+        return Forbidden(ustr(exception)), False
+    if isinstance(exception, HTTPException):
+        return exception, False
+    return InternalServerError(exception), False
+
+
+def get_exception_json(exception, include_description=False, environ=None):
+    """Return the json document (as dict) describing the given
+    HTTPException"""
+    res = {"code": exception.code, "name": escape(exception.name)}
+    description = exception.get_description(environ)
+    if config.get_misc("base_rest", "dev_mode"):
+        # return exception info only if base_rest is in dev_mode
+        res.update(
+            {
+                "traceback": getattr(exception, "traceback", None),
+                "description": description,
+            }
+        )
+    elif include_description:
+        res["description"] = description
+    return res
+
+
+class ClientErrorLogger(object):
+    """Rate limited logger of the expected client errors (4xx).
+
+    The first error of a kind (status, http method and exception) is logged
+    (without traceback) once by period, the next ones are only counted. The
+    counts are logged at the end of the period by a timer started at the
+    first error of the period, or by ``flush`` (called at the exit of the
+    process).
+    """
+
+    def __init__(self, period=60):
+        self.period = period
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._period_start = time.monotonic()
+        self._timer = None
+
+    def log(self, key, message, *args):
+        """Log or count an error of the given kind"""
+        to_flush = None
+        with self._lock:
+            now = time.monotonic()
+            if now - self._period_start >= self.period:
+                to_flush = self._start_period(now)
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+            # the timer thread doesn't survive a fork
+            if self._timer is None or not self._timer.is_alive():
+                self._start_timer(self._period_start + self.period - now)
+        if to_flush:
+            self._log_counts(to_flush)
+        if not count:
+            _logger.info(message, *args)
+
+    def flush(self):
+        """Log the counts of the current period and start a new period"""
+        with self._lock:
+            to_flush = self._start_period(time.monotonic())
+        self._log_counts(to_flush)
+
+    def _start_period(self, now):
+        """Start a new period and return the counts of the previous one"""
+        counts, self._counts = self._counts, {}
+        self._period_start = now
+        timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        return counts
+
+    def _start_timer(self, delay):
+        self._timer = threading.Timer(max(delay, 0), self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _log_counts(self, counts):
+        for key, count in counts.items():
+            if count > 1:
+                _logger.info(
+                    "%d client errors %s during the last %ss",
+                    count,
+                    " ".join(str(k) for k in key),
+                    self.period,
+                )
+
+
+_client_error_logger = ClientErrorLogger(
+    period=int(config.get_misc("base_rest", "client_error_log_period", 60))
+)
+atexit.register(_client_error_logger.flush)
+
+
+def is_expected_error(exception):
+    """
+    Return True if the given HTTPException is an expected client error. The
+    traceback of these errors is not captured and they are logged by the
+    ``ClientErrorLogger``. All the errors are fully captured in dev_mode.
+    """
+    return exception.code < 500 and not config.get_misc("base_rest", "dev_mode")
 
 
 def wrapJsonException(exception, include_description=False):
@@ -56,29 +305,34 @@ def wrapJsonException(exception, include_description=False):
     to render it like a json"""
 
     get_original_headers = exception.get_headers
-    exception.traceback = "".join(traceback.format_exception(*sys.exc_info()))
+    expected = is_expected_error(exception)
+    if not expected:
+        exception.traceback = "".join(traceback.format_exception(*sys.exc_info()))
 
     def get_body(environ=None):
-        res = {"code": exception.code, "name": escape(exception.name)}
-        description = exception.get_description(environ)
-        if config.get_misc("base_rest", "dev_mode"):
-            # return exception info only if base_rest is in dev_mode
-            res.update({"traceback": exception.traceback, "description": description})
-        elif include_description:
-            res["description"] = description
-        return JSONEncoder().encode(res)
+        res = get_exception_json(exception, include_description, environ)
+        return get_json_codec().dumps(res).decode("utf-8")
 
     def get_headers(environ=None):
         """Get a list of headers."""
         _headers = [("Content-Type", "application/json")]
         for key, value in get_original_headers(environ=environ):
             if key != "Content-Type":
-                _headers.append(key, value)
+                _headers.append((key, value))
         return _headers
 
     exception.get_body = get_body
     exception.get_headers = get_headers
-    if request:
+    if request and expected:
+        httprequest = request.httprequest
+        _client_error_logger.log(
+            (exception.code, httprequest.method, exception.__class__.__name__),
+            "RESTFULL call to url %s with method %s raise the following error %s",
+            httprequest.path,
+            httprequest.method,
+            exception,
+        )
+    elif request:
         httprequest = request.httprequest
         headers = dict(httprequest.headers)
         headers.pop("Api-Key", None)
@@ -100,21 +354,120 @@ def wrapJsonException(exception, include_description=False):
     return exception
 
 
+# window bits of zlib by content encoding
+_ZLIB_WBITS = {"gzip": 16 + zlib.MAX_WBITS, "deflate": zlib.MAX_WBITS}
+
+# default maximum size of a decompressed request body
+DEFAULT_MAX_DECODED_BODY_SIZE = 32 * 1024 * 1024
+
+
+def negotiate_content_encoding(httprequest, encodings=("gzip", "deflate")):
+    """Return the content encoding to use to compress the response according
+    to the Accept-Encoding header of the request or None"""
+    return httprequest.accept_encodings.best_match(encodings)
+
+
+def compress_response(response, encoding, level=6, min_size=0):
+    """
+    Compress the body of the response with the given content encoding
+    ('gzip' or 'deflate'). A streamed response is compressed chunk by chunk.
+    :param response: a werkzeug response
+    :param encoding:
+    :param level: compression level (1-9)
+    :param min_size: the body of a not streamed response is not compressed if
+                     its size is below this value
+    :return: the response
+    """
+    if (
+        encoding not in _ZLIB_WBITS
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+    if response.is_streamed:
+        response.response = _compress_iter(response.response, encoding, level)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        compressor = zlib.compressobj(level, zlib.DEFLATED, _ZLIB_WBITS[encoding])
+        response.set_data(compressor.compress(data) + compressor.flush())
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def _compress_iter(iterable, encoding, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _ZLIB_WBITS[encoding])
+    try:
+        for chunk in iterable:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        if hasattr(iterable, "close"):
+            iterable.close()
+
+
+def decode_content(data, encoding, max_size=DEFAULT_MAX_DECODED_BODY_SIZE):
+    """
+    Decompress a request body encoded with the given content encoding
+    ('gzip' or 'deflate')
+    :raise BadRequest: if the encoding is not supported or the data invalid
+    :raise RequestEntityTooLarge: if the decompressed body is bigger than
+                                  max_size
+    """
+    wbits = _ZLIB_WBITS.get(encoding)
+    if wbits is None:
+        raise BadRequest("Unsupported content encoding %s" % encoding)
+    decompressor = zlib.decompressobj(wbits)
+    try:
+        decoded = decompressor.decompress(data, max_size + 1)
+    except zlib.error:
+        raise BadRequest("Invalid %s encoded body" % encoding)
+    if len(decoded) > max_size or decompressor.unconsumed_tail:
+        raise RequestEntityTooLarge()
+    return decoded
+
+
 class HttpRestRequest(HttpRequest):
     """Http request that always return json, usefull for rest api"""
 
     def __init__(self, httprequest):
         super(HttpRestRequest, self).__init__(httprequest)
-        if self.httprequest.mimetype == "application/json":
-            data = self.httprequest.get_data().decode(self.httprequest.charset)
-            self.params = json.loads(data)
-        else:
-            # We reparse the query_string in order to handle data structure
-            # more information on https://github.com/aventurella/pyquerystring
-            self.params = pyquerystring.parse(
-                self.httprequest.query_string.decode("utf-8")
-            )
-        self._determine_context_lang()
+        self.phase_timer = new_phase_timer()
+        with self.phase_timer.phase("parse"):
+            if self.httprequest.mimetype == "application/json":
+                data = self.httprequest.get_data()
+                content_encoding = self.httprequest.headers.get("Content-Encoding")
+                if content_encoding and content_encoding.lower() != "identity":
+                    max_size = int(
+                        config.get_misc(
+                            "base_rest",
+                            "max_decoded_body_size",
+                            DEFAULT_MAX_DECODED_BODY_SIZE,
+                        )
+                    )
+                    data = decode_content(data, content_encoding.lower(), max_size)
+                if self.httprequest.charset.lower() not in ("utf-8", "utf8"):
+                    data = data.decode(self.httprequest.charset)
+                self.params = get_json_codec().loads(data)
+                if isinstance(self.params, list):
+                    # a json array is a list of operations to process in batch
+                    # (the params are given as keyword arguments to the route)
+                    self.params = {"operations": self.params}
+            else:
+                # We reparse the query_string in order to handle data structure
+                # more information on https://github.com/aventurella/pyquerystring
+                self.params = pyquerystring.parse(
+                    self.httprequest.query_string.decode("utf-8")
+                )
+        with self.phase_timer.phase("lang"):
+            self._determine_context_lang()
 
     def _determine_context_lang(self):
         """
@@ -126,35 +479,78 @@ class HttpRestRequest(HttpRequest):
         accepted_langs = self.httprequest.headers.get("Accept-language")
         if not accepted_langs:
             return
-        parsed_accepted_langs = parse_accept_language(accepted_langs)
+        services_registry = _rest_services_databases.get(self.session.db)
+        # the installed languages are read with a dedicated environment to
+        # not create the environment of the request before its context is
+        # initialized
+        env = api.Environment(self.cr, SUPERUSER_ID, {})
+        if services_registry is None:
+            locale = self._get_accepted_locale(
+                accepted_langs, *self._get_installed_locales(env)
+            )
+        else:
+            locale = self._get_cached_accepted_locale(
+                services_registry, env, accepted_langs
+            )
+        if locale:
+            # the environment of the request is not yet created so it's
+            # created with the new lang
+            context = dict(self.context)
+            context["lang"] = locale
+            self.context = context
+
+    def _get_cached_accepted_locale(self, services_registry, env, accepted_langs):
+        installed = env["res.lang"].get_installed()
+        installed_locales = services_registry.installed_locales
+        # get_installed is cached by the ORM, a new result means that the
+        # installed languages may have changed
+        if installed_locales is None or installed_locales[0] is not installed:
+            installed_locales = (installed,) + self._get_installed_locales(
+                env, installed
+            )
+            services_registry.accept_language_cache.clear()
+            services_registry.installed_locales = installed_locales
+        cache = services_registry.accept_language_cache
+        locale = cache.get(accepted_langs)
+        if locale is None:
+            locale = self._get_accepted_locale(accepted_langs, *installed_locales[1:])
+            # the headers without installed locale are also cached
+            cache[accepted_langs] = locale or ""
+        return locale or None
+
+    def _get_installed_locales(self, env, installed=None):
+        """Return a tuple (set of installed locales, dict of installed locales
+        by language)"""
+        if installed is None:
+            installed = env["res.lang"].get_installed()
         installed_locale_langs = set()
         installed_locale_by_lang = defaultdict(list)
-        for lang_code, _name in self.env["res.lang"].get_installed():
+        for lang_code, _name in installed:
             installed_locale_langs.add(lang_code)
             installed_locale_by_lang[lang_code.split("_")[0]].append(lang_code)
+        return installed_locale_langs, installed_locale_by_lang
 
+    def _get_accepted_locale(
+        self, accepted_langs, installed_locale_langs, installed_locale_by_lang
+    ):
+        try:
+            parsed_accepted_langs = parse_accept_language(accepted_langs)
+        except ValueError:
+            _logger.debug("Invalid Accept-Language header %s", accepted_langs)
+            return None
         # parsed_acccepted_langs is sorted by priority (higher first)
         for lang in parsed_accepted_langs:
             # we first check if a locale (en_GB) is available into the list of
             # available locales into Odoo
-            locale = None
             if lang.locale in installed_locale_langs:
-                locale = lang.locale
+                return lang.locale
             # if no locale language is installed, we look for an available
             # locale for the given language (en). We return the first one
             # found for this language.
-            else:
-                locales = installed_locale_by_lang.get(lang.language)
-                if locales:
-                    locale = locales[0]
-            if locale:
-                # reset the context to put our new lang.
-                context = dict(self._context)
-                context["lang"] = locale
-                # the setter defiend in odoo.http.WebRequest reset the env
-                # when setting a new context
-                self.context = context
-                break
+            locales = installed_locale_by_lang.get(lang.language)
+            if locales:
+                return locales[0]
+        return None
 
     def _handle_exception(self, exception):
         """Called within an except block to allow converting exceptions
@@ -166,24 +562,113 @@ class HttpRestRequest(HttpRequest):
             return wrapJsonException(Unauthorized(ustr(exception)))
         try:
             return super(HttpRestRequest, self)._handle_exception(exception)
-        except (UserError, ValidationError) as e:
-            return wrapJsonException(BadRequest(e.name), include_description=True)
-        except MissingError as e:
-            return wrapJsonException(NotFound(ustr(e)))
-        except (AccessError, AccessDenied) as e:
-            return wrapJsonException(Forbidden(ustr(e)))
-        except HTTPException as e:
-            return wrapJsonException(e)
         except Exception as e:  # flake8: noqa: E722
-            return wrapJsonException(InternalServerError(e))
+            http_exception, include_description = get_http_exception(e)
+            return wrapJsonException(
+                http_exception, include_description=include_description
+            )
 
     def make_json_response(self, data, headers=None, cookies=None):
-        data = JSONEncoder().encode(data)
+        data = get_json_codec().dumps(data)
         if headers is None:
             headers = {}
         headers["Content-Type"] = "application/json"
         return self.make_response(data, headers=headers, cookies=cookies)
 
+    def make_json_stream_response(self, streamed, headers=None, cookies=None):
+        """
+        Return a response with the json document of a ``StreamedRows``.
+
+        If the rows are deferred (see ``StreamedRows``), the document is
+        serialized by chunks while the response is sent, once the request is
+        processed. The rows are then read with an environment on a cursor
+        opened and closed by the response itself, never committed. Since the
+        status of the response is already sent, an error raised while
+        streaming ends the rows and is returned into the 'error' field of the
+        document (as the error of a request). The duration of the streaming
+        is logged.
+
+        Otherwise the rows are read with the cursor of the request and
+        serialized while the request is processed.
+        """
+        if headers is None:
+            headers = {}
+        headers["Content-Type"] = "application/json"
+        if streamed.is_deferred:
+            response = Response(
+                self._stream_json(streamed, self.db, self.uid, dict(self.context)),
+                headers=headers,
+                direct_passthrough=True,
+            )
+        else:
+            chunks = self._iter_json_chunks(streamed, streamed.iter_rows(self.env))
+            response = Response(list(chunks), headers=headers)
+        if cookies:
+            for k, v in cookies.items():
+                response.set_cookie(k, v)
+        return response
+
+    _stream_buffer_size = 64 * 1024
+
+    def _stream_json(self, streamed, db, uid, context):
+        start = time.time()
+        count = 0
+        done = False
+        try:
+            # the environments of the response are released once it is sent
+            with api.Environment.manage():
+                cr = odoo.registry(db).cursor()
+                try:
+                    env = api.Environment(cr, uid, context)
+                    rows = streamed.iter_rows(env)
+                    for chunk in self._iter_json_chunks(streamed, rows):
+                        count += 1
+                        yield chunk
+                    done = True
+                finally:
+                    cr.rollback()
+                    cr.close()
+        except Exception as e:
+            _logger.exception("Error while streaming the json response")
+            if not done:
+                http_exception, include_description = get_http_exception(e)
+                error = get_exception_json(http_exception, include_description)
+                error = get_json_codec().dumps(error)
+                # the chunks sent so far always end with a whole row
+                if count:
+                    yield b'],"error":' + error + b"}"
+                else:
+                    yield b'{"error":' + error + b"}"
+        finally:
+            _logger.info(
+                "Json response streamed in %d chunks in %.1f ms",
+                count,
+                (time.time() - start) * 1000,
+            )
+
+    def _iter_json_chunks(self, streamed, rows):
+        codec = get_json_codec()
+        envelope = codec.dumps(streamed.envelope)
+        key = codec.dumps(streamed.rows_key)
+        if streamed.envelope:
+            buf = [envelope[:-1], b",", key, b":["]
+        else:
+            buf = [b"{", key, b":["]
+        size = 0
+        separator = b""
+        for row in rows:
+            data = codec.dumps(row)
+            buf.append(separator)
+            buf.append(data)
+            separator = b","
+            size += len(data)
+            if size >= self._stream_buffer_size:
+                yield b"".join(buf)
+                buf = []
+                size = 0
+        buf.append(b"]}")
+        yield b"".join(buf)
+
 
 ori_get_request = Root.get_request
 
@@ -191,10 +676,8 @@ ori_get_request = Root.get_request
 def get_request(self, httprequest):
     db = httprequest.session.db
     service_registry = _rest_services_databases.get(db)
-    if service_registry:
-        for root_path in service_registry:
-            if httprequest.path.startswith(root_path):
-                return HttpRestRequest(httprequest)
+    if service_registry and service_registry.match_root_path(httprequest.path):
+        return HttpRestRequest(httprequest)
     return ori_get_request(self, httprequest)
 
 
@@ -0,0 +1,405 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+"""
+
+REST Metrics
+============
+
+Number of calls by http status class, histogram of the latency of the
+calls and number of invalid responses found by sampling by collection,
+service and method.
+
+The metrics are enabled by the option 'metrics_file' of the section
+'[base_rest]' of the server config file. The counters are stored into this
+file, mapped in memory by all the processes of the server, so the metrics of
+all the workers of a prefork server are aggregated.
+
+The file is made of a header followed by a fixed number of slots (option
+'metrics_slots', 512 by default) and an overflow slot. A slot holds the
+counters of a (collection, service, method). It's found by hashing its key
+and is locked (fcntl) while it's updated. Once all the slots are used, the
+calls of the new keys are counted into the overflow slot, so the size of the
+file and the memory used don't depend on the number of services.
+
+On the platforms without fcntl (Windows), the counters are kept in the memory
+of each process and the metrics are those of the process serving the
+metrics.
+
+"""
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+
+from odoo.tools.config import config
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    _logger.debug("Can not import fcntl, the REST metrics are not shared")
+
+# upper bounds of the buckets of the latency histogram (in seconds)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+DEFAULT_SLOTS = 512
+OVERFLOW_KEY = "__overflow__"
+
+MAGIC = b"BRMETRIC"
+VERSION = 3
+HEADER_STRUCT = struct.Struct("<8sII")
+HEADER_SIZE = 64
+KEY_SIZE = 256
+# key, count by status class, count by bucket (+Inf included), total
+# count, sum of the durations, number of SQL queries, sum of the durations of
+# the SQL queries, number of invalid responses found by sampling
+SLOT_STRUCT = struct.Struct(
+    "<%ds%dQ%dQQdQdQ" % (KEY_SIZE, len(STATUS_CLASSES), len(BUCKETS) + 1)
+)
+SLOT_SIZE = SLOT_STRUCT.size
+_STATUS_START = 1
+_BUCKETS_START = _STATUS_START + len(STATUS_CLASSES)
+_COUNT = _BUCKETS_START + len(BUCKETS) + 1
+_SUM = _COUNT + 1
+_SQL_COUNT = _SUM + 1
+_SQL_SUM = _SQL_COUNT + 1
+_OUTPUT_VALIDATION_FAILURES = _SQL_SUM + 1
+
+
+class SharedMetrics(object):
+    """Metrics of the REST calls stored into a file shared by the
+    processes of the server"""
+
+    def __init__(self, path, slots=DEFAULT_SLOTS):
+        self.path = path
+        self.slots = slots
+        self.pid = os.getpid()
+        self.size = HEADER_SIZE + (slots + 1) * SLOT_SIZE
+        # fcntl locks don't exclude the threads of a process
+        self._lock = threading.Lock()
+        # slot index by key for the keys already used by this process
+        self._indexes = {}
+        self._full = False
+        if fcntl is None:
+            self._fd = None
+            self._mmap = mmap.mmap(-1, self.size)
+            self._init_overflow_slot()
+        else:
+            self._fd = self._open_file()
+            self._mmap = mmap.mmap(self._fd, self.size)
+
+    def _init_overflow_slot(self):
+        overflow = OVERFLOW_KEY.encode("utf-8")
+        offset = self._get_offset(self.slots)
+        self._mmap[offset : offset + len(overflow)] = overflow
+
+    def _open_file(self):
+        """Open the file of the metrics. A new file is initialized under an
+        exclusive lock. A file with another layout is replaced by a new file
+        and never truncated in place since other processes may have mapped
+        it (the metrics are then reset)."""
+        header = HEADER_STRUCT.pack(MAGIC, VERSION, self.slots)
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX, HEADER_SIZE, 0)
+                if self._prepare_file(fd, header):
+                    fcntl.lockf(fd, fcntl.LOCK_UN, HEADER_SIZE, 0)
+                    return fd
+            except BaseException:
+                os.close(fd)
+                raise
+            # the file has been replaced, the new one is opened
+            os.close(fd)
+
+    def _prepare_file(self, fd, header):
+        """Return True if the opened file can be mapped, initialize it if
+        it's new"""
+        if not _is_same_file(fd, self.path):
+            # the file has been replaced by another process
+            return False
+        size = os.fstat(fd).st_size
+        if not size:
+            _logger.info("Initialize the REST metrics file %s", self.path)
+            self._init_file(fd, header)
+        elif size != self.size or os.pread(fd, len(header), 0) != header:
+            _logger.info("Replace the REST metrics file %s", self.path)
+            self._replace_file(header)
+            return False
+        return True
+
+    def _init_file(self, fd, header):
+        # the file is empty: it's extended, not truncated
+        os.ftruncate(fd, self.size)
+        os.pwrite(fd, header, 0)
+        overflow = OVERFLOW_KEY.encode("utf-8")
+        os.pwrite(fd, overflow, self._get_offset(self.slots))
+
+    def _replace_file(self, header):
+        tmp_path = "%s.%d.tmp" % (self.path, os.getpid())
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            self._init_file(fd, header)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, self.path)
+
+    def _get_offset(self, index):
+        return HEADER_SIZE + index * SLOT_SIZE
+
+    def _lock_slot(self, index, shared=False):
+        if self._fd is not None:
+            cmd = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            fcntl.lockf(self._fd, cmd, SLOT_SIZE, self._get_offset(index))
+
+    def _unlock_slot(self, index):
+        if self._fd is not None:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, SLOT_SIZE, self._get_offset(index))
+
+    def _get_slot(self, key):
+        """Return the index of the slot of the given key. A free slot is
+        allocated to a new key or the overflow slot if all are used."""
+        index = self._indexes.get(key)
+        if index is not None:
+            return index
+        if self._full:
+            return self.slots
+        encoded = key.encode("utf-8")[:KEY_SIZE]
+        start = zlib.crc32(encoded) % self.slots
+        for i in range(self.slots):
+            index = (start + i) % self.slots
+            offset = self._get_offset(index)
+            self._lock_slot(index)
+            try:
+                current = self._mmap[offset : offset + KEY_SIZE].rstrip(b"\0")
+                if not current:
+                    self._mmap[offset : offset + len(encoded)] = encoded
+                    current = encoded
+            finally:
+                self._unlock_slot(index)
+            if current == encoded:
+                self._indexes[key] = index
+                return index
+        _logger.warning(
+            "All the slots of the REST metrics are used, the next services "
+            "are counted into the overflow slot."
+        )
+        self._full = True
+        return self.slots
+
+    def observe(
+        self,
+        collection,
+        service,
+        method,
+        status,
+        duration,
+        sql_count=0,
+        sql_duration=0.0,
+    ):
+        """
+        Count a call
+        :param collection: name of the collection of the service
+        :param service: name (usage) of the service
+        :param method: name of the method
+        :param status: http status of the response
+        :param duration: duration of the call in seconds
+        :param sql_count: number of SQL queries executed by the call
+        :param sql_duration: duration of these queries in seconds
+        """
+        status_index = min(max(int(status) // 100, 1), 5) - 1
+        bucket_index = len(BUCKETS)
+        for i, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                bucket_index = i
+                break
+        with self._update_slot(collection, service, method) as values:
+            values[_STATUS_START + status_index] += 1
+            values[_BUCKETS_START + bucket_index] += 1
+            values[_COUNT] += 1
+            values[_SUM] += duration
+            values[_SQL_COUNT] += sql_count
+            values[_SQL_SUM] += sql_duration
+
+    def observe_output_validation_failure(self, collection, service, method):
+        """
+        Count an invalid response found by sampling
+        :param collection: name of the collection of the service
+        :param service: name (usage) of the service
+        :param method: name of the method
+        """
+        with self._update_slot(collection, service, method) as values:
+            values[_OUTPUT_VALIDATION_FAILURES] += 1
+
+    @contextmanager
+    def _update_slot(self, collection, service, method):
+        """Yield the list of the values of the slot of the given labels
+        and write it back into the slot"""
+        key = "\t".join((collection or "", service or "", method or ""))
+        with self._lock:
+            index = self._get_slot(key)
+            offset = self._get_offset(index)
+            self._lock_slot(index)
+            try:
+                values = list(SLOT_STRUCT.unpack_from(self._mmap, offset))
+                yield values
+                SLOT_STRUCT.pack_into(self._mmap, offset, *values)
+            finally:
+                self._unlock_slot(index)
+
+    def collect(self):
+        """
+        Return the metrics of all the processes
+        :return: a list of tuple (labels dict, counts by status class,
+                 counts by bucket, total count, sum of durations, number of
+                 SQL queries, sum of the durations of the SQL queries, number
+                 of invalid responses found by sampling)
+        """
+        res = []
+        with self._lock:
+            for index in range(self.slots + 1):
+                offset = self._get_offset(index)
+                self._lock_slot(index, shared=True)
+                try:
+                    values = SLOT_STRUCT.unpack_from(self._mmap, offset)
+                finally:
+                    self._unlock_slot(index)
+                key = values[0].rstrip(b"\0").decode("utf-8", "replace")
+                if not key or not (
+                    values[_COUNT] or values[_OUTPUT_VALIDATION_FAILURES]
+                ):
+                    continue
+                parts = key.split("\t")
+                if len(parts) != 3:
+                    parts = ("", key, "")
+                labels = dict(zip(("collection", "service", "method"), parts))
+                res.append(
+                    (
+                        labels,
+                        values[_STATUS_START:_BUCKETS_START],
+                        values[_BUCKETS_START:_COUNT],
+                        values[_COUNT],
+                        values[_SUM],
+                        values[_SQL_COUNT],
+                        values[_SQL_SUM],
+                        values[_OUTPUT_VALIDATION_FAILURES],
+                    )
+                )
+        return res
+
+    def render_text(self):
+        """Return the metrics in the Prometheus text format"""
+        lines = [
+            "# HELP base_rest_requests_total Number of calls to the REST services",
+            "# TYPE base_rest_requests_total counter",
+        ]
+        collected = self.collect()
+        for labels, statuses, *__ in collected:
+            for status_class, count in zip(STATUS_CLASSES, statuses):
+                if count:
+                    lines.append(
+                        "base_rest_requests_total{%s} %d"
+                        % (_format_labels(labels, status=status_class), count)
+                    )
+        lines += [
+            "# HELP base_rest_request_duration_seconds Duration of the calls to "
+            "the REST services",
+            "# TYPE base_rest_request_duration_seconds histogram",
+        ]
+        for labels, __, buckets, count, total, *__ in collected:
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS + ("+Inf",), buckets):
+                cumulative += bucket_count
+                lines.append(
+                    "base_rest_request_duration_seconds_bucket{%s} %d"
+                    % (_format_labels(labels, le=str(bound)), cumulative)
+                )
+            lines.append(
+                "base_rest_request_duration_seconds_sum{%s} %r"
+                % (_format_labels(labels), total)
+            )
+            lines.append(
+                "base_rest_request_duration_seconds_count{%s} %d"
+                % (_format_labels(labels), count)
+            )
+        lines += [
+            "# HELP base_rest_sql_queries_total Number of SQL queries executed "
+            "by the REST services",
+            "# TYPE base_rest_sql_queries_total counter",
+        ]
+        for labels, *__, sql_count, __, __ in collected:
+            lines.append(
+                "base_rest_sql_queries_total{%s} %d"
+                % (_format_labels(labels), sql_count)
+            )
+        lines += [
+            "# HELP base_rest_sql_duration_seconds_total Duration of the SQL "
+            "queries executed by the REST services",
+            "# TYPE base_rest_sql_duration_seconds_total counter",
+        ]
+        for labels, *__, sql_total, __ in collected:
+            lines.append(
+                "base_rest_sql_duration_seconds_total{%s} %r"
+                % (_format_labels(labels), sql_total)
+            )
+        lines += [
+            "# HELP base_rest_output_validation_failures_total Number of "
+            "invalid responses found by sampling",
+            "# TYPE base_rest_output_validation_failures_total counter",
+        ]
+        for labels, *__, failures in collected:
+            lines.append(
+                "base_rest_output_validation_failures_total{%s} %d"
+                % (_format_labels(labels), failures)
+            )
+        return "\n".join(lines) + "\n"
+
+
+def _is_same_file(fd, path):
+    """Return True if the file descriptor is the one of the file at path"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    fd_stat = os.fstat(fd)
+    return (stat.st_dev, stat.st_ino) == (fd_stat.st_dev, fd_stat.st_ino)
+
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, **extra):
+    items = list(labels.items()) + sorted(extra.items())
+    return ",".join('%s="%s"' % (name, _escape_label(value)) for name, value in items)
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """
+    Return the shared metrics or None if the metrics are not enabled. The
+    file is mapped once by process.
+    :return: a SharedMetrics or None
+    """
+    global _metrics
+    path = config.get_misc("base_rest", "metrics_file")
+    if not path:
+        return None
+    metrics = _metrics
+    if metrics is None or metrics.path != path or metrics.pid != os.getpid():
+        with _metrics_lock:
+            metrics = _metrics
+            if metrics is None or metrics.path != path or metrics.pid != os.getpid():
+                slots = int(
+                    config.get_misc("base_rest", "metrics_slots", DEFAULT_SLOTS)
+                )
+                metrics = _metrics = SharedMetrics(path, slots)
+    return metrics
@@ -10,15 +10,25 @@ Register available REST services at the build of a registry.
 This code is inspired by ``odoo.addons.component.builder.ComponentBuilder``
 
 """
+
+import logging
+from contextlib import contextmanager
+
 import odoo
 from odoo import api, http, models
 
+from odoo.addons.component.core import WorkContext
+
+from ..controllers.main import _PseudoCollection
 from ..core import (
     RestServicesRegistry,
     _rest_controllers_per_module,
     _rest_services_databases,
+    get_service_usages,
 )
 
+_logger = logging.getLogger(__name__)
+
 
 class RestServiceRegistation(models.AbstractModel):
     """Register REST services into the REST services registry
@@ -40,8 +50,12 @@ class RestServiceRegistation(models.AbstractModel):
         # so in case the registry is rebuilt (cache invalidation, ...),
         # we have to to rebuild the registry. We use a new
         # registry so we have an empty cache and we'll add services in it.
-        services_registry = self._init_global_registry()
+        # The new registry is only published once the root paths of the
+        # services are registered.
+        services_registry = RestServicesRegistry()
         self.build_registry(services_registry)
+        services_registry.match_root_path("/")  # build the trie of root paths
+        self._publish_global_registry(services_registry)
         # we also have to remove the RestController from the
         # controller_per_module registry since it's an abstract controller
         controllers = http.controllers_per_module["base_rest"]
@@ -49,6 +63,7 @@ class RestServiceRegistation(models.AbstractModel):
             (name, cls) for name, cls in controllers if "RestController" not in name
         ]
         http.controllers_per_module["base_rest"] = controllers
+        self.build_dispatch_tables(services_registry)
 
     def build_registry(self, services_registry, states=None, exclude_addons=None):
         if not states:
@@ -78,7 +93,38 @@ class RestServiceRegistation(models.AbstractModel):
         for controller_def in controller_defs:
             services_registry[controller_def["root_path"]] = controller_def
 
+    def build_dispatch_tables(self, services_registry):
+        """Fill the registry with the dispatch tables (and the validators) of
+        all the registered services"""
+        for spec in list(services_registry.values()):
+            collection_name = spec["collection_name"]
+            with self._work_on_services(collection_name) as work:
+                components = work.components_registry.lookup(collection_name)
+                usages = get_service_usages(components)
+                services_registry.service_usages[collection_name] = frozenset(usages)
+                for usage in usages:
+                    try:
+                        work.component(usage=usage)._get_dispatch_table()
+                    except Exception:
+                        # the service is broken, the dispatch table will be
+                        # built (and fail) again at the first call
+                        _logger.warning(
+                            "Unable to build the dispatch table of the service "
+                            "%s in collection %s",
+                            usage,
+                            collection_name,
+                            exc_info=True,
+                        )
+
+    @contextmanager
+    def _work_on_services(self, collection_name):
+        collection = _PseudoCollection(collection_name, self.env)
+        yield WorkContext(model_name="rest.service.registration", collection=collection)
+
     def _init_global_registry(self):
         services_registry = RestServicesRegistry()
-        _rest_services_databases[self.env.cr.dbname] = services_registry
+        self._publish_global_registry(services_registry)
         return services_registry
+
+    def _publish_global_registry(self, services_registry):
+        _rest_services_databases[self.env.cr.dbname] = services_registry
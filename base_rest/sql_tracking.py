@@ -0,0 +1,140 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+"""
+
+REST SQL Tracking
+=================
+
+Count the SQL queries executed by the methods of the REST services to detect
+the methods executing the same query for each record they return (N+1
+queries).
+
+The tracking is enabled by the option 'sql_tracking' of the section
+'[base_rest]' of the server config file. The queries are then grouped by
+normalized statement (literals replaced by '?') and a warning is logged when
+a statement is executed more than 'sql_repeat_threshold' times (20 by
+default) by a call to a method.
+
+"""
+
+import re
+import time
+
+from odoo.tools.config import config
+
+DEFAULT_REPEAT_THRESHOLD = 20
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACES_RE = re.compile(r"\s+")
+_MODIFIED_TABLE_RE = re.compile(
+    r'\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+"?(\w+)"?', re.IGNORECASE
+)
+
+# normalized statements by query, bounded to not keep the queries with
+# inlined values forever
+_normalized = {}
+_MAX_NORMALIZED = 2048
+
+
+def normalize_statement(query):
+    """Return the statement of the given query with its literals replaced by
+    '?' and its whitespaces collapsed"""
+    if not isinstance(query, str):
+        query = str(query)
+    statement = _normalized.get(query)
+    if statement is None:
+        statement = _STRING_RE.sub("?", query)
+        statement = _NUMBER_RE.sub("?", statement)
+        statement = _LIST_RE.sub("(?)", statement)
+        statement = _SPACES_RE.sub(" ", statement).strip()
+        if len(_normalized) >= _MAX_NORMALIZED:
+            _normalized.clear()
+        _normalized[query] = statement
+    return statement
+
+
+class QueryTracker(object):
+    """Count the queries executed by a cursor while the tracker is active.
+
+    .. code-block:: python
+
+        with QueryTracker(env.cr) as tracker:
+            ...
+        tracker.count, tracker.duration, tracker.statements
+    """
+
+    def __init__(self, cr):
+        self.cr = cr
+        self.count = 0
+        self.duration = 0.0
+        # [count, duration] by normalized statement
+        self.statements = {}
+        self._patched = None
+
+    def __enter__(self):
+        cr = self.cr
+        # an execute method set on the cursor by another tracker
+        self._patched = cr.__dict__.get("execute")
+        execute = cr.execute
+
+        def tracked_execute(query, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return execute(query, *args, **kwargs)
+            finally:
+                self._add(query, time.perf_counter() - start)
+
+        cr.execute = tracked_execute
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if self._patched is None:
+            del self.cr.execute
+        else:
+            self.cr.execute = self._patched
+
+    def _add(self, query, duration):
+        self.count += 1
+        self.duration += duration
+        stats = self.statements.setdefault(normalize_statement(query), [0, 0.0])
+        stats[0] += 1
+        stats[1] += duration
+
+    def get_repeated(self, threshold):
+        """Return the statements executed more than threshold times as a
+        list of (statement, count, duration) sorted by count"""
+        res = [
+            (statement, count, duration)
+            for statement, (count, duration) in self.statements.items()
+            if count > threshold
+        ]
+        res.sort(key=lambda r: r[1], reverse=True)
+        return res
+
+
+class ModifiedTablesTracker(QueryTracker):
+    """Collect the tables modified (inserted, updated or deleted rows) by the
+    queries executed by a cursor while the tracker is active"""
+
+    def __init__(self, cr):
+        super(ModifiedTablesTracker, self).__init__(cr)
+        self.tables = set()
+
+    def _add(self, query, duration):
+        if not isinstance(query, str):
+            query = str(query)
+        match = _MODIFIED_TABLE_RE.match(query)
+        if match:
+            self.tables.add(match.group(1))
+
+
+def is_sql_tracking_enabled():
+    return bool(config.get_misc("base_rest", "sql_tracking"))
+
+
+def get_repeat_threshold():
+    return int(
+        config.get_misc("base_rest", "sql_repeat_threshold", DEFAULT_REPEAT_THRESHOLD)
+    )
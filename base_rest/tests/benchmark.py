@@ -0,0 +1,176 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+"""
+
+Benchmarks
+==========
+
+Helpers to write benchmarks running with the Odoo test runner. The results
+(operations by second and percentiles of the duration of an operation) are
+logged at the end of the test class and compared with a baseline.
+
+The benchmarks are configured by the section '[base_rest]' of the server
+config file:
+
+* 'benchmark_baseline': path of a json file holding the baseline results
+* 'benchmark_save_baseline': if enabled, the results are saved as the new
+  baseline instead of being compared with it
+* 'benchmark_tolerance': the max slowdown accepted compared with the baseline
+  (0.2 by default: a benchmark fails if it's more than 20% slower)
+* 'benchmark_min_time': min duration of a benchmark in seconds (0.5 by
+  default)
+
+"""
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from odoo.tools.config import config
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_TOLERANCE = 0.2
+DEFAULT_MIN_TIME = 0.5
+MAX_ITERATIONS = 100000
+WARMUP_ITERATIONS = 3
+
+
+def _percentile(sorted_values, percent):
+    """Return the given percentile of sorted values (nearest rank)"""
+    index = max(int(round(percent / 100.0 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def run_benchmark(func, min_time=None, max_iterations=MAX_ITERATIONS):
+    """
+    Call func repeatedly during min_time seconds (and at least once) and
+    return the statistics of the durations of the calls.
+    :param func: a callable without argument
+    :param min_time: min duration of the benchmark in seconds
+    :param max_iterations: max number of calls
+    :return: an OrderedDict with the number of iterations, the operations by
+             second and the mean, p50, p90 and p99 durations of a call in
+             microseconds
+    """
+    if min_time is None:
+        min_time = float(
+            config.get_misc("base_rest", "benchmark_min_time", DEFAULT_MIN_TIME)
+        )
+    for __ in range(WARMUP_ITERATIONS):
+        func()
+    durations = []
+    perf_counter = time.perf_counter
+    started = perf_counter()
+    while len(durations) < max_iterations:
+        start = perf_counter()
+        func()
+        end = perf_counter()
+        durations.append(end - start)
+        if end - started >= min_time:
+            break
+    total = sum(durations)
+    durations.sort()
+    return OrderedDict(
+        [
+            ("iterations", len(durations)),
+            ("ops_per_sec", round(len(durations) / total, 1) if total else 0.0),
+            ("mean_us", round(total / len(durations) * 1e6, 2)),
+            ("p50_us", round(_percentile(durations, 50) * 1e6, 2)),
+            ("p90_us", round(_percentile(durations, 90) * 1e6, 2)),
+            ("p99_us", round(_percentile(durations, 99) * 1e6, 2)),
+        ]
+    )
+
+
+class BenchmarkMixin(object):
+    """Mixin for the test cases running benchmarks.
+
+    .. code-block:: python
+
+        @tagged("-standard", "benchmark")
+        class TestBenchmark(SavepointCase, BenchmarkMixin):
+            @classmethod
+            def setUpClass(cls):
+                super(TestBenchmark, cls).setUpClass()
+                cls.setUpBenchmark()
+
+            @classmethod
+            def tearDownClass(cls):
+                cls.tearDownBenchmark()
+                super(TestBenchmark, cls).tearDownClass()
+
+            def test_ping(self):
+                self.benchmark("ping", lambda: service.dispatch("get", 1))
+    """
+
+    @classmethod
+    def setUpBenchmark(cls):
+        cls._benchmark_results = OrderedDict()
+        cls._benchmark_baseline = {}
+        path = config.get_misc("base_rest", "benchmark_baseline")
+        if path and os.path.exists(path):
+            with open(path) as f:
+                cls._benchmark_baseline = json.load(f)
+
+    @classmethod
+    def tearDownBenchmark(cls):
+        results = cls._benchmark_results
+        if not results:
+            return
+        lines = [
+            "%-45s %12s %10s %10s %10s" % ("", "ops/s", "p50 us", "p90 us", "p99 us")
+        ]
+        for name, result in results.items():
+            lines.append(
+                "%-45s %12.1f %10.2f %10.2f %10.2f"
+                % (
+                    name,
+                    result["ops_per_sec"],
+                    result["p50_us"],
+                    result["p90_us"],
+                    result["p99_us"],
+                )
+            )
+        _logger.info("Benchmarks of %s\n%s", cls.__name__, "\n".join(lines))
+        path = config.get_misc("base_rest", "benchmark_baseline")
+        if path and config.get_misc("base_rest", "benchmark_save_baseline"):
+            baseline = {}
+            if os.path.exists(path):
+                with open(path) as f:
+                    baseline = json.load(f)
+            baseline.update(results)
+            with open(path, "w") as f:
+                json.dump(baseline, f, indent=2, sort_keys=True)
+            _logger.info("Benchmark baseline saved into %s", path)
+
+    def benchmark(self, name, func, min_time=None):
+        """
+        Run a benchmark, record its result and check that it's not slower
+        than its baseline.
+        :param name: unique name of the benchmark
+        :param func: a callable without argument running the operation
+        :param min_time: min duration of the benchmark in seconds
+        :return: the result of the benchmark (see ``run_benchmark``)
+        """
+        result = run_benchmark(func, min_time=min_time)
+        self._benchmark_results[name] = result
+        baseline = self._benchmark_baseline.get(name)
+        if baseline and not config.get_misc("base_rest", "benchmark_save_baseline"):
+            tolerance = float(
+                config.get_misc("base_rest", "benchmark_tolerance", DEFAULT_TOLERANCE)
+            )
+            expected = baseline["ops_per_sec"] * (1 - tolerance)
+            self.assertGreaterEqual(
+                result["ops_per_sec"],
+                expected,
+                "Benchmark %s: %.1f ops/s, baseline %.1f ops/s (tolerance %d%%)"
+                % (
+                    name,
+                    result["ops_per_sec"],
+                    baseline["ops_per_sec"],
+                    tolerance * 100,
+                ),
+            )
+        return result
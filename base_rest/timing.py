@@ -0,0 +1,144 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+"""
+
+REST Phase Timing
+=================
+
+Timings of the phases of the processing of a REST request (parsing of the
+body, resolution of the lang, validation of the input, call of the method,
+validation of the output, rendering of the response, ...).
+
+The timings are recorded into the ``PhaseTimer`` of the request when the
+option 'server_timing' of the section '[base_rest]' of the server config file
+is enabled (the timings are then returned into a ``Server-Timing`` header),
+when the access log is enabled (the timings are then written into the access
+log), or when the metrics or the SQL tracking are enabled.
+
+"""
+import time
+from collections import OrderedDict
+
+from odoo.http import request
+from odoo.tools.config import config
+
+
+class _Phase(object):
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+
+
+class _NullPhase(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        pass
+
+
+_null_phase = _NullPhase()
+
+
+class PhaseTimer(object):
+    """Record the duration of the phases of a request. The durations of the
+    phases with the same name are summed.
+
+    .. code-block:: python
+
+        with timer.phase("method"):
+            ...
+    """
+
+    __slots__ = ("phases", "counts")
+
+    enabled = True
+
+    def __init__(self):
+        self.phases = OrderedDict()
+        # number of operations by phase (ie queries of the 'sql' phase)
+        self.counts = {}
+
+    def phase(self, name):
+        """Return a context manager timing the given phase"""
+        return _Phase(self, name)
+
+    def add(self, name, duration, count=None):
+        """Add the duration (in seconds) of the given phase and the number of
+        operations done during this duration"""
+        self.phases[name] = self.phases.get(name, 0.0) + duration
+        if count is not None:
+            self.counts[name] = self.counts.get(name, 0) + count
+
+    def as_ms(self):
+        """Return the durations of the phases in milliseconds"""
+        return OrderedDict(
+            (name, round(duration * 1000, 3)) for name, duration in self.phases.items()
+        )
+
+    def to_header(self):
+        """Return the value of the Server-Timing header"""
+        values = []
+        for name, duration in self.phases.items():
+            value = "%s;dur=%.3f" % (name, duration * 1000)
+            if name in self.counts:
+                value += ';desc="%d"' % self.counts[name]
+            values.append(value)
+        return ", ".join(values)
+
+
+class NullPhaseTimer(object):
+    """Timer used when the timings are disabled"""
+
+    __slots__ = ()
+
+    enabled = False
+    phases = {}
+    counts = {}
+
+    def phase(self, name):
+        return _null_phase
+
+    def add(self, name, duration, count=None):
+        pass
+
+    def as_ms(self):
+        return {}
+
+    def to_header(self):
+        return ""
+
+
+NULL_TIMER = NullPhaseTimer()
+
+
+def is_server_timing_enabled():
+    return bool(config.get_misc("base_rest", "server_timing"))
+
+
+def new_phase_timer():
+    """Return a new timer for a request or the null timer if the timings are
+    not enabled"""
+    options = ("server_timing", "access_log", "metrics_file", "sql_tracking")
+    if any(config.get_misc("base_rest", option) for option in options):
+        return PhaseTimer()
+    return NULL_TIMER
+
+
+def get_phase_timer():
+    """Return the timer of the current request (the null timer out of a REST
+    request)"""
+    if not request:
+        return NULL_TIMER
+    return getattr(request, "phase_timer", NULL_TIMER)
@@ -0,0 +1,448 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+"""
+
+Validators
+==========
+
+Helpers used to validate the parameters and the responses of the REST
+services.
+
+* :class:`ThreadLocalValidator` allows to share a Cerberus validator between
+  threads.
+* :func:`compile_validator` compiles the schema of a Cerberus validator into
+  plain python functions normalizing and validating a document. Only the
+  subset of rules used by the REST services is supported (``type``,
+  ``required``, ``nullable``, ``empty``, ``coerce``, ``default``,
+  ``allowed``, ``min``, ``max``, ``minlength``, ``maxlength``, ``regex`` and
+  nested ``schema`` for ``dict`` and ``list``). When a schema uses another
+  rule, the schema is not compiled and the Cerberus validator must be used.
+
+A compiled validator only knows how to accept a document. As soon as a
+document is not accepted by the compiled functions, the document is given to
+the Cerberus validator so the returned document and errors are always the
+ones computed by Cerberus.
+"""
+
+import copy
+import logging
+import re
+import threading
+from collections.abc import Iterable, Sized
+
+_logger = logging.getLogger(__name__)
+
+try:
+    from cerberus import Validator
+except ImportError:
+    _logger.debug("Can not import cerberus")
+
+
+SUPPORTED_RULES = {
+    "allowed",
+    "coerce",
+    "default",
+    "empty",
+    "max",
+    "maxlength",
+    "meta",
+    "min",
+    "minlength",
+    "nullable",
+    "regex",
+    "required",
+    "schema",
+    "type",
+}
+
+
+class ThreadLocalValidator(object):
+    """Share a Cerberus validator between threads.
+
+    A Cerberus validator keeps the state of its last validation (document,
+    errors, ...) and can't be used by two threads at the same time. This
+    proxy gives to each thread its own copy of the wrapped validator. The
+    copies reuse the definition schema of the wrapped validator so the schema
+    is only checked once.
+    """
+
+    def __init__(self, validator):
+        self._validator = validator
+        self._local = threading.local()
+        self._local.validator = validator
+
+    @property
+    def schema(self):
+        return self._validator.schema
+
+    def _copy_validator(self):
+        # the validator is copied rather than instantiated again since the
+        # __init__ of a subclass of Validator can expect other arguments. The
+        # state of a validation is reset by each call to validate, only the
+        # config and the error handler are not shared with the wrapped
+        # validator
+        validator = copy.copy(self._validator)
+        validator._config = dict(validator._config)
+        validator.error_handler = copy.copy(validator.error_handler)
+        return validator
+
+    def _get_thread_validator(self):
+        validator = getattr(self._local, "validator", None)
+        if validator is None:
+            validator = self._local.validator = self._copy_validator()
+        return validator
+
+    def validate(self, *args, **kwargs):
+        return self._get_thread_validator().validate(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._get_thread_validator(), name)
+
+
+class CompiledValidator(object):
+    """Validator using the functions compiled from the schema of a Cerberus
+    validator.
+
+    It exposes the same API as a Cerberus validator (``schema``,
+    ``validate``, ``document`` and ``errors``). The state of the last
+    validation is kept by thread so an instance can be shared between threads.
+    """
+
+    def __init__(self, validator, function):
+        self._fallback = ThreadLocalValidator(validator)
+        self._function = function
+        self._local = threading.local()
+
+    @property
+    def schema(self):
+        return self._fallback.schema
+
+    def validate(self, document, *args, **kwargs):
+        local = self._local
+        if not args and not kwargs:
+            try:
+                local.document = self._function(document)
+                local.compiled = True
+                return True
+            except Exception:  # pylint: disable=broad-except
+                # not accepted by the compiled functions, let Cerberus
+                # validate the document and compute the errors
+                pass
+        local.compiled = False
+        return self._fallback.validate(document, *args, **kwargs)
+
+    @property
+    def document(self):
+        if getattr(self._local, "compiled", False):
+            return self._local.document
+        return self._fallback.document
+
+    @property
+    def errors(self):
+        if getattr(self._local, "compiled", False):
+            return {}
+        return self._fallback.errors
+
+    def __getattr__(self, name):
+        return getattr(self._fallback, name)
+
+
+def compile_validator(validator):
+    """Return a :class:`CompiledValidator` for the given Cerberus validator or
+    None if the schema or the configuration of the validator is not supported
+    by the compiler.
+    """
+    if type(validator) is not Validator:
+        # a specialized validator can change the processing of the rules
+        return None
+    config = validator._config
+    if (
+        config.get("allow_unknown")
+        or config.get("require_all")
+        or config.get("ignore_none_values")
+    ):
+        return None
+    try:
+        function = _SchemaCompiler(validator).compile(validator.schema)
+    except _UnsupportedSchema as e:
+        _logger.debug("Schema not compiled: %s", e)
+        return None
+    return CompiledValidator(validator, function)
+
+
+class _UnsupportedSchema(Exception):
+    """Raised when a schema can't be compiled"""
+
+
+class _Invalid(Exception):
+    """Raised by the compiled functions when a document is not accepted"""
+
+
+_MISSING = object()
+
+
+class _SchemaCompiler(object):
+    """Generate the source code of the functions normalizing and validating
+    a document according to a Cerberus schema.
+
+    The generated code mimics the processing of Cerberus:
+
+    1. unknown fields are purged (or rejected)
+    2. default values are set
+    3. values are coerced
+    4. values are validated; nested documents are normalized and validated
+       by their own function
+    5. required fields must be present
+    """
+
+    def __init__(self, validator):
+        self.types_mapping = validator.types_mapping
+        self.purge_unknown = validator.purge_unknown
+        self.namespace = {
+            "_Invalid": _Invalid,
+            "_MISSING": _MISSING,
+            "Iterable": Iterable,
+            "Sized": Sized,
+        }
+        self.sources = []
+        self._counter = 0
+
+    def compile(self, schema):
+        name = self._compile_mapping(schema)
+        source = "\n\n".join(self.sources)
+        exec(  # pylint: disable=exec-used
+            compile(source, "<compiled cerberus schema>", "exec"), self.namespace
+        )
+        root = self.namespace[name]
+
+        def validate(document):
+            if type(document) is not dict:
+                raise _Invalid()
+            return root(document)
+
+        return validate
+
+    def _new_name(self, prefix):
+        self._counter += 1
+        return "_%s_%d" % (prefix, self._counter)
+
+    def _constant(self, value):
+        name = self._new_name("c")
+        self.namespace[name] = value
+        return name
+
+    def _check_rules(self, rules):
+        if not isinstance(rules, dict):
+            raise _UnsupportedSchema("rules must be a dict: %r" % (rules,))
+        unsupported = set(rules) - SUPPORTED_RULES
+        if unsupported:
+            raise _UnsupportedSchema("unsupported rules %s" % sorted(unsupported))
+
+    def _compile_mapping(self, schema):
+        if not hasattr(schema, "items"):
+            raise _UnsupportedSchema("schema must be a mapping: %r" % (schema,))
+        fields = list(schema.items())
+        for field, rules in fields:
+            if not isinstance(field, str):
+                raise _UnsupportedSchema("field names must be strings")
+            self._check_rules(rules)
+        name = self._new_name("mapping")
+        known = self._constant(frozenset(field for field, _rules in fields))
+        lines = ["def %s(value):" % name]
+        if self.purge_unknown:
+            lines.append(
+                "    doc = {k: v for k, v in value.items() if k in %s}" % known
+            )
+        else:
+            lines += [
+                "    for k in value:",
+                "        if k not in %s:" % known,
+                "            raise _Invalid()",
+                "    doc = dict(value)",
+            ]
+        for field, rules in fields:
+            lines += self._compile_field(field, rules)
+        lines.append("    return doc")
+        self.sources.append("\n".join(lines))
+        return name
+
+    def _compile_field(self, field, rules):
+        key = repr(field)
+        lines = ["    v = doc.get(%s, _MISSING)" % key]
+        if "default" in rules:
+            default = self._constant(rules["default"])
+            if rules.get("nullable", False):
+                lines.append("    if v is _MISSING:")
+            else:
+                lines.append("    if v is _MISSING or v is None:")
+            lines.append("        v = doc[%s] = %s" % (key, default))
+        lines.append("    if v is not _MISSING:")
+        body = self._compile_coerce(rules)
+        value_function = self._compile_value(rules)
+        if value_function:
+            body.append("v = %s(v)" % value_function)
+        if body:
+            lines += ["        " + line for line in body]
+            lines.append("        doc[%s] = v" % key)
+        else:
+            lines.append("        pass")
+        if rules.get("required", False) is True:
+            lines += ["    else:", "        raise _Invalid()"]
+        return lines
+
+    def _compile_coerce(self, rules):
+        """Return the lines coercing the value ``v``"""
+        if "coerce" not in rules:
+            return []
+        processors = rules["coerce"]
+        if callable(processors):
+            processors = [processors]
+        elif not isinstance(processors, (list, tuple)) or not all(
+            callable(p) for p in processors
+        ):
+            raise _UnsupportedSchema("only callables are supported by coerce")
+        nullable = rules.get("nullable", False)
+        lines = []
+        for processor in processors:
+            lines += [
+                "try:",
+                "    v = %s(v)" % self._constant(processor),
+                "except Exception:",
+            ]
+            if nullable:
+                lines += ["    if v is not None:", "        raise _Invalid()"]
+            else:
+                lines.append("    raise _Invalid()")
+        return lines
+
+    def _compile_item(self, rules):
+        """Return the name of a function normalizing and validating an item
+        of a list"""
+        self._check_rules(rules)
+        name = self._new_name("item")
+        lines = ["def %s(v):" % name]
+        if "default" in rules and not rules.get("nullable", False):
+            lines += [
+                "    if v is None:",
+                "        v = %s" % self._constant(rules["default"]),
+            ]
+        lines += ["    " + line for line in self._compile_coerce(rules)]
+        value_function = self._compile_value(rules)
+        if value_function:
+            lines.append("    v = %s(v)" % value_function)
+        lines.append("    return v")
+        self.sources.append("\n".join(lines))
+        return name
+
+    def _compile_type(self, types):
+        if isinstance(types, str):
+            types = [types]
+        conditions = []
+        for _type in types:
+            definition = self.types_mapping.get(_type)
+            if definition is None:
+                raise _UnsupportedSchema("unknown type %s" % _type)
+            condition = "isinstance(v, %s)" % self._constant(definition.included_types)
+            if definition.excluded_types:
+                condition += " and not isinstance(v, %s)" % self._constant(
+                    definition.excluded_types
+                )
+            conditions.append("(%s)" % condition)
+        return ["if not (%s):" % " or ".join(conditions), "    raise _Invalid()"]
+
+    def _compile_schema(self, rules):
+        schema = rules["schema"]
+        _type = rules.get("type")
+        if _type == "dict":
+            mapping_function = self._compile_mapping(schema)
+            return [
+                "if type(v) is not dict:",
+                "    raise _Invalid()",
+                "v = %s(v)" % mapping_function,
+            ]
+        if _type == "list":
+            item_function = self._compile_item(schema)
+            return [
+                "if type(v) is list:",
+                "    v = [%s(i) for i in v]" % item_function,
+                "elif type(v) is tuple:",
+                "    v = tuple(%s(i) for i in v)" % item_function,
+                "else:",
+                "    raise _Invalid()",
+            ]
+        raise _UnsupportedSchema("schema rule is only supported for dict and list")
+
+    def _compile_min_max(self, rules):
+        lines = []
+        for rule, operator in (("min", "<"), ("max", ">")):
+            if rule in rules:
+                lines += [
+                    "try:",
+                    "    if v %s %s:" % (operator, self._constant(rules[rule])),
+                    "        raise _Invalid()",
+                    "except TypeError:",
+                    "    pass",
+                ]
+        return lines
+
+    def _compile_allowed(self, allowed):
+        try:
+            allowed_set = frozenset(allowed)
+        except TypeError:
+            raise _UnsupportedSchema("allowed values must be hashable")
+        allowed_set = self._constant(allowed_set)
+        return [
+            "if isinstance(v, Iterable) and not isinstance(v, str):",
+            "    if not %s.issuperset(v):" % allowed_set,
+            "        raise _Invalid()",
+            "elif v not in %s:" % allowed_set,
+            "    raise _Invalid()",
+        ]
+
+    def _compile_value(self, rules):
+        """Return the name of a function validating a value according to the
+        validation rules or None if there is nothing to validate"""
+        lines = []
+        # nullable is always processed first: a null value is not validated
+        # against the other rules
+        if rules.get("nullable", False):
+            lines += ["if v is None:", "    return v"]
+        else:
+            lines += ["if v is None:", "    raise _Invalid()"]
+        if rules.get("type"):
+            lines += self._compile_type(rules["type"])
+        if "schema" in rules:
+            lines += self._compile_schema(rules)
+        if "empty" in rules:
+            # an empty value is not validated against the rules related to
+            # the content of the value
+            lines.append("if isinstance(v, Sized) and len(v) == 0:")
+            if not rules["empty"]:
+                lines.append("    raise _Invalid()")
+            else:
+                lines += ["    " + line for line in self._compile_min_max(rules)]
+                lines.append("    return v")
+        if "allowed" in rules:
+            lines += self._compile_allowed(rules["allowed"])
+        lines += self._compile_min_max(rules)
+        for rule, operator in (("minlength", "<"), ("maxlength", ">")):
+            if rule in rules:
+                lines += [
+                    "if isinstance(v, Iterable) and len(v) %s %s:"
+                    % (operator, self._constant(rules[rule])),
+                    "    raise _Invalid()",
+                ]
+        if "regex" in rules:
+            pattern = rules["regex"]
+            if not pattern.endswith("$"):
+                pattern += "$"
+            lines += [
+                "if isinstance(v, str) and not %s.match(v):"
+                % self._constant(re.compile(pattern)),
+                "    raise _Invalid()",
+            ]
+        name = self._new_name("value")
+        lines = ["def %s(v):" % name] + ["    " + line for line in lines]
+        lines.append("    return v")
+        self.sources.append("\n".join(lines))
+        return name
@@ -14,3 +14,11 @@ class BaseRestDemoPrivateApiController(main.RestController):
     _root_path = "/base_rest_demo_api/private/"
     _collection_name = "base.rest.demo.private.services"
     _default_auth = "user"
+
+
+class BaseRestDemoCatchAllApiController(main.RestController):
+    _root_path = "/base_rest_demo_api/catch_all/"
+    _collection_name = "base.rest.demo.public.services"
+    _default_auth = "public"
+    _auth_by_method = {"DELETE": "user"}
+    _routing_mode = "catch_all"
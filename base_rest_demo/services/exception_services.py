@@ -21,6 +21,7 @@ class ExceptionService(Component):
     _name = "exception.service"
     _usage = "exception"
     _collection = "base.rest.demo.public.services"
+    _static_validators = True
     _description = """
         Exception Services
 
@@ -15,6 +15,7 @@ class PartnerImageService(Component):
     _name = "partner_image.service"
     _usage = "partner_image"
     _collection = "base.rest.demo.private.services"
+    _static_validators = True
     _description = """
         Partner Image Services
 
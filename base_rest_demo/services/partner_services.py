@@ -1,38 +1,66 @@
 # Copyright 2018 ACSONE SA/NV
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
-from odoo.addons.base_rest.components.service import to_bool, to_int
+from odoo.addons.base_rest.components.service import (
+    StreamedRows,
+    batched,
+    cache_control,
+    to_bool,
+    to_int,
+)
 from odoo.addons.component.core import Component
 
 
 class PartnerService(Component):
-    _inherit = "base.rest.service"
+    _inherit = ["base.rest.service", "base.rest.keyset.pagination"]
     _name = "partner.service"
     _usage = "partner"
     _collection = "base.rest.demo.private.services"
+    _static_validators = True
     _description = """
         Partner Services
         Access to the partner services is only allowed to authenticated users.
         If you are not authenticated go to <a href='/web/login'>Login</a>
     """
 
+    @cache_control(max_age=60, records="_get")
     def get(self, _id):
         """
         Get partner's informations
         """
         return self._to_json(self._get(_id))
 
-    def search(self, name):
+    def search(self, name, limit, cursor=None):
         """
         Searh partner by name
         """
-        partners = self.env["res.partner"].name_search(name)
-        partners = self.env["res.partner"].browse([i[0] for i in partners])
-        rows = []
-        res = {"count": len(partners), "rows": rows}
-        for partner in partners:
-            rows.append(self._to_json(partner))
+        domain = [("name", "ilike", name)]
+        partners, next_cursor = self._paginate("res.partner", domain, limit, cursor)
+        res = {
+            "rows": [self._to_json(partner) for partner in partners],
+            "next_cursor": next_cursor,
+        }
+        # the partners are only counted for the first page
+        if not cursor:
+            res["count"] = self.env["res.partner"].search_count(domain)
         return res
 
+    @batched(batch_size=200)
+    def export(self, name):
+        """
+        Export all the partners matching the given name
+        """
+        domain = [("name", "ilike", name)]
+        batch_size = self._get_batch_size("export")
+
+        def rows(env):
+            partners = self._search_batched(
+                "res.partner", domain, batch_size=batch_size, env=env
+            )
+            return (self._to_json(partner) for partner in partners)
+
+        # the rows are streamed to the client while they are read
+        return StreamedRows(rows, count=self.env["res.partner"].search_count(domain))
+
     # pylint:disable=method-required-super
     def create(self, **params):
         """
@@ -84,9 +112,20 @@ class PartnerService(Component):
         return res
 
     def _validator_search(self):
-        return {"name": {"type": "string", "nullable": False, "required": True}}
+        res = {"name": {"type": "string", "nullable": False, "required": True}}
+        res.update(self._get_pagination_schema())
+        return res
 
     def _validator_return_search(self):
+        res = self._validator_return_export()
+        res["count"] = {"type": "integer"}
+        res.update(self._get_pagination_return_schema())
+        return res
+
+    def _validator_export(self):
+        return {"name": {"type": "string", "nullable": False, "required": True}}
+
+    def _validator_return_export(self):
         return {
             "count": {"type": "integer", "required": True},
             "rows": {
@@ -1,6 +1,6 @@
 # Copyright 2018 ACSONE SA/NV
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
-from odoo.addons.base_rest.components.service import to_int
+from odoo.addons.base_rest.components.service import cache_control, to_int
 from odoo.addons.component.core import Component
 
 
@@ -9,12 +9,14 @@ class PingService(Component):
     _name = "ping.service"
     _usage = "ping"
     _collection = "base.rest.demo.public.services"
+    _static_validators = True
     _description = """
         Ping Services
         Access to the ping services is allowed to everyone
     """
 
     # The following method are 'public' and can be called from the controller.
+    @cache_control(max_age=300, public=True)
     def get(self, _id, message):
         """
         This method is used to get the information of the object specified
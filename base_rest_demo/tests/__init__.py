@@ -1,3 +1,15 @@
 from . import test_controller
 from . import test_openapi
 from . import test_exception
+from . import test_validator
+from . import test_service
+from . import test_api_docs
+from . import test_batch
+from . import test_catch_all
+from . import test_cache_control
+from . import test_compression
+from . import test_http
+from . import test_access_log
+from . import test_timing
+from . import test_metrics
+from . import test_benchmark
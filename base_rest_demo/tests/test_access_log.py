@@ -0,0 +1,68 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+import json
+import os
+import tempfile
+
+import odoo.tests.common
+import odoo.tools
+from odoo.tests import HttpCase
+from odoo.tools.config import config
+
+from odoo.addons.base_rest import access_log
+from odoo.addons.base_rest.tests.common import RegistryMixin
+
+
+@odoo.tests.common.at_install(False)
+@odoo.tests.common.post_install(True)
+class TestAccessLog(HttpCase, RegistryMixin):
+    @classmethod
+    def setUpClass(cls):
+        super(TestAccessLog, cls).setUpClass()
+        cls.setUpRegistry()
+        host = "127.0.0.1"
+        port = odoo.tools.config["http_port"]
+        cls.url = "http://%s:%d/base_rest_demo_api/public" % (host, port)
+
+    def setUp(self):
+        super(TestAccessLog, self).setUp()
+        fd, self.path = tempfile.mkstemp(suffix=".log")
+        os.close(fd)
+        self.addCleanup(os.unlink, self.path)
+        options = config.misc.setdefault("base_rest", {})
+        self.addCleanup(options.pop, "access_log", None)
+        options["access_log"] = self.path
+        self.addCleanup(setattr, access_log, "_writer", None)
+
+    def _read_records(self):
+        access_log.get_access_log_writer().stop(timeout=5)
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_redact_headers(self):
+        headers = [("Api-Key", "secret"), ("Accept", "*/*")]
+        self.assertEqual(
+            access_log.redact_headers(headers, {"api-key"}),
+            {"Api-Key": access_log.REDACTED, "Accept": "*/*"},
+        )
+
+    def test_access_log(self):
+        response = self.opener.get(
+            "%s/ping/1?message=m" % self.url, headers={"Api-Key": "secret"}
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.opener.get("%s/ping/1/unknown" % self.url)
+        self.assertEqual(response.status_code, 404)
+        records = self._read_records()
+        self.assertEqual(len(records), 1)
+        record = records[0]
+        self.assertEqual(record["service"], "ping")
+        self.assertEqual(record["method"], "get")
+        self.assertEqual(record["id"], 1)
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(record["headers"]["Api-Key"], access_log.REDACTED)
+        self.assertGreaterEqual(record["duration_ms"], 0)
+        self.assertEqual(
+            list(record["phases"]),
+            ["parse", "lang", "cache", "input", "method", "output", "response"],
+        )
@@ -0,0 +1,54 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+import json
+from unittest import mock
+
+import odoo.tests.common
+import odoo.tools
+from odoo.tests import HttpCase
+
+from odoo.addons.base_rest.core import _rest_services_databases
+from odoo.addons.base_rest.tests.common import RegistryMixin
+
+
+@odoo.tests.common.at_install(False)
+@odoo.tests.common.post_install(True)
+class TestApiDocs(HttpCase, RegistryMixin):
+    @classmethod
+    def setUpClass(cls):
+        super(TestApiDocs, cls).setUpClass()
+        cls.setUpRegistry()
+        host = "127.0.0.1"
+        port = odoo.tools.config["http_port"]
+        cls.url = "http://%s:%d/api-docs/base_rest_demo_api/public/ping.json" % (
+            host,
+            port,
+        )
+
+    def test_etag(self):
+        response = self.url_open(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/json")
+        etag = response.headers["ETag"]
+        self.assertTrue(etag)
+        body = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(body["info"]["title"], "ping REST services")
+        # the document is cached: same etag for the same document
+        response = self.url_open(self.url)
+        self.assertEqual(response.headers["ETag"], etag)
+        response = self.opener.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.content)
+        response = self.opener.get(self.url, headers={"If-None-Match": '"other"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_registry_not_built(self):
+        # the collections are unknown while the registry of the REST services
+        # of the database isn't built
+        with mock.patch.dict(_rest_services_databases, clear=True):
+            response = self.url_open(self.url)
+        self.assertEqual(response.status_code, 503)
+
+    def test_unknown_collection(self):
+        response = self.url_open(self.url.replace("/public/", "/unknown/"))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,90 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+import json
+
+from werkzeug.exceptions import Forbidden
+
+import odoo.tests.common
+import odoo.tools
+from odoo.tests import HttpCase
+
+from odoo.addons.base_rest.tests.common import RegistryMixin
+
+from ..controllers.main import BaseRestDemoPublicApiController
+
+
+@odoo.tests.common.at_install(False)
+@odoo.tests.common.post_install(True)
+class TestBatch(HttpCase, RegistryMixin):
+    @classmethod
+    def setUpClass(cls):
+        super(TestBatch, cls).setUpClass()
+        cls.setUpRegistry()
+        host = "127.0.0.1"
+        port = odoo.tools.config["http_port"]
+        cls.url = "http://%s:%d/base_rest_demo_api/public/_batch" % (host, port)
+
+    def setUp(self):
+        super(TestBatch, self).setUp()
+        self.opener.headers["Content-Type"] = "application/json"
+
+    @odoo.tools.mute_logger(
+        "odoo.addons.base_rest.controllers.main", "odoo.addons.base_rest.http"
+    )
+    def test_batch(self):
+        operations = [
+            {"service": "ping", "method": "get", "id": 1, "params": {"message": "m"}},
+            {"service": "ping", "method": "search", "params": {}},
+            {"service": "ping", "method": "unknown"},
+            {"service": "exception", "method": "user_error"},
+            {"service": "exception", "method": "missing_error"},
+            "invalid",
+        ]
+        response = self.url_open(self.url, json.dumps(operations))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/json")
+        results = json.loads(response.content.decode("utf-8"))
+        self.assertEqual([r["status"] for r in results], [200, 400, 404, 400, 404, 400])
+        self.assertEqual(results[0]["result"], {"message": "m", "id": 1})
+        self.assertEqual(
+            results[3]["error"],
+            {
+                "code": 400,
+                "name": "Bad Request",
+                "description": "<p>UserError message</p>",
+            },
+        )
+
+    @odoo.tools.mute_logger("odoo.addons.base_rest.controllers.main")
+    def test_batch_invalid_id(self):
+        operations = [
+            {"service": "ping", "method": "get", "id": _id, "params": {}}
+            for _id in (True, [1, 2], "1", 0, -1)
+        ]
+        response = self.url_open(self.url, json.dumps(operations))
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(response.content.decode("utf-8"))
+        self.assertEqual([r["status"] for r in results], [400] * 5)
+
+    def test_batch_operations_key(self):
+        operations = [
+            {"service": "ping", "method": "get", "id": 2, "params": {"message": "m"}}
+        ]
+        response = self.url_open(self.url, json.dumps({"operations": operations}))
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(
+            results, [{"status": 200, "result": {"message": "m", "id": 2}}]
+        )
+
+    def test_batch_operation_auth(self):
+        controller = BaseRestDemoPublicApiController()
+        controller._check_batch_operation_auth("get")
+        controller._check_batch_operation_auth("update")
+        # the operations called through another HTTP method with another auth
+        # than the POST are rejected
+        controller._auth_by_method = {"GET": "user", "DELETE": "user"}
+        controller._check_batch_operation_auth("create")
+        for method_name in ("get", "search", "delete"):
+            with self.assertRaises(Forbidden):
+                controller._check_batch_operation_auth(method_name)
@@ -0,0 +1,131 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+import json
+
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+from odoo.http import root
+from odoo.tests import tagged
+
+from odoo.addons.base_rest.http import HttpRestRequest
+from odoo.addons.base_rest.tests.benchmark import BenchmarkMixin
+from odoo.addons.base_rest.tools import cerberus_to_json
+
+from .common import CommonCase
+
+PAYLOAD_SIZES = (1, 100, 1000)
+
+
+@tagged("-standard", "benchmark")
+class TestBenchmark(CommonCase, BenchmarkMixin):
+    """Benchmarks of the hot path of base_rest. Run them with
+    ``--test-tags benchmark``."""
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestBenchmark, cls).setUpClass()
+        cls.setUpBenchmark()
+        cls.partner = cls.env["res.partner"].create(
+            {
+                "name": "Benchmark partner",
+                "street": "Street",
+                "zip": "1000",
+                "city": "City",
+                "country_id": cls.env.ref("base.be").id,
+            }
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tearDownBenchmark()
+        super(TestBenchmark, cls).tearDownClass()
+
+    def _get_rows(self, size):
+        return [
+            {
+                "id": i,
+                "name": "Partner %d" % i,
+                "street": "Street",
+                "zip": "1000",
+                "city": "City",
+                "country": {"id": 1, "name": "Belgium"},
+            }
+            for i in range(size)
+        ]
+
+    def _new_http_request(self, body):
+        builder = EnvironBuilder(
+            method="POST", data=body, content_type="application/json"
+        )
+        httprequest = Request(builder.get_environ())
+        httprequest.session = root.session_store.new()
+        return httprequest
+
+    def test_dispatch(self):
+        ping_service = self.public_services_env.component(usage="ping")
+        self.benchmark(
+            "dispatch ping.get",
+            lambda: ping_service.dispatch("get", 1, {"message": "hello"}),
+        )
+        partner_service = self.private_services_env.component(usage="partner")
+        self.benchmark(
+            "dispatch partner.get",
+            lambda: partner_service.dispatch("get", self.partner.id),
+        )
+        self.benchmark(
+            "dispatch partner.search",
+            lambda: partner_service.dispatch(
+                "search", params={"name": "Benchmark partner"}
+            ),
+        )
+
+    def test_validation(self):
+        partner_service = self.private_services_env.component(usage="partner")
+        input_validator = partner_service._get_input_validator("create")
+        params = {
+            "name": "Partner",
+            "street": "Street",
+            "zip": "1000",
+            "city": "City",
+            "country": {"id": 1},
+        }
+        self.benchmark(
+            "validate partner.create input",
+            lambda: input_validator.validate(params),
+        )
+        output_validator = partner_service._get_output_validator("get")
+        row = self._get_rows(1)[0]
+        self.benchmark(
+            "validate partner.get output", lambda: output_validator.validate(row)
+        )
+        output_validator = partner_service._get_output_validator("search")
+        for size in PAYLOAD_SIZES:
+            document = {"count": size, "rows": self._get_rows(size)}
+            self.benchmark(
+                "validate partner.search output (%d rows)" % size,
+                lambda document=document: output_validator.validate(document),
+            )
+
+    def test_openapi(self):
+        partner_service = self.private_services_env.component(usage="partner")
+        schema = partner_service._get_input_schema("create")
+        self.benchmark(
+            "cerberus_to_json partner.create", lambda: cerberus_to_json(schema)
+        )
+        self.benchmark("to_openapi partner", partner_service.to_openapi)
+
+    def test_http_request(self):
+        for size in PAYLOAD_SIZES:
+            body = json.dumps({"rows": self._get_rows(size)}).encode("utf-8")
+            self.benchmark(
+                "parse request (%d rows)" % size,
+                lambda body=body: HttpRestRequest(self._new_http_request(body)),
+            )
+        rest_request = HttpRestRequest(self._new_http_request(b"{}"))
+        for size in PAYLOAD_SIZES:
+            data = {"count": size, "rows": self._get_rows(size)}
+            self.benchmark(
+                "make_json_response (%d rows)" % size,
+                lambda data=data: rest_request.make_json_response(data),
+            )
@@ -0,0 +1,59 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+import odoo.tests.common
+import odoo.tools
+from odoo.tests import HttpCase
+
+from odoo.addons.base_rest.tests.common import RegistryMixin
+
+
+@odoo.tests.common.at_install(False)
+@odoo.tests.common.post_install(True)
+class TestCacheControl(HttpCase, RegistryMixin):
+    @classmethod
+    def setUpClass(cls):
+        super(TestCacheControl, cls).setUpClass()
+        cls.setUpRegistry()
+        host = "127.0.0.1"
+        port = odoo.tools.config["http_port"]
+        cls.url = "http://%s:%d/base_rest_demo_api" % (host, port)
+
+    def test_public_cache_control(self):
+        response = self.url_open("%s/public/ping/1?message=hello" % self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Cache-Control"], "public, max-age=300")
+        self.assertEqual(response.headers["Vary"], "Accept-Language, Accept-Encoding")
+        self.assertNotIn("ETag", response.headers)
+
+    def test_etag(self):
+        partner = self.env.ref("base.res_partner_1")
+        self.authenticate("admin", "admin")
+        url = "%s/private/partner/%d" % (self.url, partner.id)
+        response = self.url_open(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Cache-Control"], "private, max-age=60")
+        etag = response.headers["ETag"]
+        last_modified = response.headers["Last-Modified"]
+        # the same etag is used for the compressed and identity responses
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        response = self.opener.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+        response = self.opener.get(
+            url, headers={"If-None-Match": etag, "Accept-Encoding": "identity"}
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.opener.get(url, headers={"If-Modified-Since": last_modified})
+        self.assertEqual(response.status_code, 304)
+        # the etag changes when the partner is modified (the write_date is
+        # updated by sql since the test runs into a single transaction)
+        self.env.cr.execute(
+            "UPDATE res_partner SET write_date = write_date - interval '1 day' "
+            "WHERE id = %s",
+            (partner.id,),
+        )
+        partner.invalidate_cache()
+        response = self.opener.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
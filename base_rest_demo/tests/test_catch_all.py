@@ -0,0 +1,92 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+import json
+
+import odoo.tests.common
+import odoo.tools
+from odoo.tests import HttpCase
+
+from odoo.addons.base_rest.tests.common import RegistryMixin
+
+
+@odoo.tests.common.at_install(False)
+@odoo.tests.common.post_install(True)
+class TestCatchAll(HttpCase, RegistryMixin):
+    @classmethod
+    def setUpClass(cls):
+        super(TestCatchAll, cls).setUpClass()
+        cls.setUpRegistry()
+        host = "127.0.0.1"
+        port = odoo.tools.config["http_port"]
+        cls.url = "http://%s:%d/base_rest_demo_api/catch_all" % (host, port)
+        cls.json_headers = {"Content-Type": "application/json"}
+
+    def _get_json(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/json")
+        return json.loads(response.content.decode("utf-8"))
+
+    def test_routing(self):
+        response = self.opener.get("%s/ping/1" % self.url, params={"message": "hello"})
+        self.assertEqual(self._get_json(response), {"message": "hello", "id": 1})
+        response = self.opener.get(
+            "%s/ping/1/get" % self.url, params={"message": "hello"}
+        )
+        self.assertEqual(self._get_json(response), {"message": "hello", "id": 1})
+        response = self.opener.get(
+            "%s/ping/search" % self.url, params={"param_required": "x"}
+        )
+        self.assertIn("param_required", self._get_json(response)["response"])
+        response = self.opener.post(
+            "%s/ping" % self.url,
+            data=json.dumps({"message": "hello"}),
+            headers=self.json_headers,
+        )
+        self.assertEqual(
+            self._get_json(response), {"response": "POST called with message hello"}
+        )
+        response = self.opener.put(
+            "%s/ping/1" % self.url,
+            data=json.dumps({"message": "hello"}),
+            headers=self.json_headers,
+        )
+        self.assertEqual(
+            self._get_json(response), {"response": "PUT called with message hello"}
+        )
+        operations = [
+            {"service": "ping", "method": "get", "id": 2, "params": {"message": "m"}}
+        ]
+        response = self.opener.post(
+            "%s/_batch" % self.url,
+            data=json.dumps(operations),
+            headers=self.json_headers,
+        )
+        self.assertEqual(
+            self._get_json(response),
+            [{"status": 200, "result": {"message": "m", "id": 2}}],
+        )
+
+    @odoo.tools.mute_logger(
+        "odoo.addons.base_rest.controllers.main", "odoo.addons.base_rest.http"
+    )
+    def test_not_found(self):
+        for path in ("unknown", "unknown/1", "ping/1/unknown", "ping/pong"):
+            response = self.opener.get("%s/%s" % (self.url, path))
+            self.assertEqual(response.status_code, 404, path)
+        response = self.opener.post(
+            "%s/unknown" % self.url, data="{}", headers=self.json_headers
+        )
+        self.assertEqual(response.status_code, 404)
+
+    @odoo.tools.mute_logger(
+        "odoo.addons.base_rest.controllers.main", "odoo.addons.base_rest.http"
+    )
+    def test_auth_by_method(self):
+        # the DELETE requires an authenticated user, not the other methods
+        response = self.opener.delete("%s/ping/1" % self.url)
+        self.assertEqual(response.status_code, 401)
+        self.authenticate("admin", "admin")
+        response = self.opener.delete("%s/ping/1" % self.url)
+        self.assertEqual(
+            self._get_json(response), {"response": "DELETE called with id 1 "}
+        )
@@ -0,0 +1,67 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+import gzip
+import json
+
+import odoo.tests.common
+import odoo.tools
+from odoo.tests import HttpCase
+
+from odoo.addons.base_rest.tests.common import RegistryMixin
+
+
+@odoo.tests.common.at_install(False)
+@odoo.tests.common.post_install(True)
+class TestCompression(HttpCase, RegistryMixin):
+    @classmethod
+    def setUpClass(cls):
+        super(TestCompression, cls).setUpClass()
+        cls.setUpRegistry()
+        host = "127.0.0.1"
+        port = odoo.tools.config["http_port"]
+        cls.url = "http://%s:%d/base_rest_demo_api/public" % (host, port)
+        cls.operations = [
+            {"service": "ping", "method": "get", "id": i, "params": {"message": "m"}}
+            for i in range(1, 100)
+        ]
+
+    def setUp(self):
+        super(TestCompression, self).setUp()
+        self.opener.headers["Content-Type"] = "application/json"
+
+    def test_compressed_response(self):
+        response = self.opener.post(
+            "%s/_batch" % self.url,
+            data=json.dumps(self.operations),
+            headers={"Accept-Encoding": "gzip"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        results = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(len(results), 99)
+
+    def test_small_response_not_compressed(self):
+        response = self.opener.get(
+            "%s/ping/1?message=m" % self.url, headers={"Accept-Encoding": "gzip"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_not_accepted_encoding(self):
+        response = self.opener.post(
+            "%s/_batch" % self.url,
+            data=json.dumps(self.operations),
+            headers={"Accept-Encoding": "identity"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_compressed_request(self):
+        data = gzip.compress(json.dumps(self.operations[:2]).encode("utf-8"))
+        response = self.opener.post(
+            "%s/_batch" % self.url, data=data, headers={"Content-Encoding": "gzip"}
+        )
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(response.content.decode("utf-8"))
+        self.assertEqual([r["status"] for r in results], [200, 200])
@@ -2,9 +2,14 @@
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
 
+from werkzeug.exceptions import NotFound
+
 from odoo.http import controllers_per_module
 
+from odoo.addons.base_rest.controllers.main import RestController, RestControllerType
+
 from ..controllers.main import (
+    BaseRestDemoCatchAllApiController,
     BaseRestDemoPrivateApiController,
     BaseRestDemoPublicApiController,
 )
@@ -43,10 +48,10 @@ class TestController(CommonCase):
                 )
 
     def test_controller_registry(self):
-        # at the end of the start process, our tow controllers must into the
+        # at the end of the start process, our three controllers must into the
         # controller registered
         controllers = controllers_per_module["base_rest_demo"]
-        self.assertEqual(len(controllers), 2)
+        self.assertEqual(len(controllers), 3)
 
         self.assertIn(
             (
@@ -64,6 +69,14 @@ class TestController(CommonCase):
             ),
             controllers,
         )
+        self.assertIn(
+            (
+                "odoo.addons.base_rest_demo.controllers.main."
+                "BaseRestDemoCatchAllApiController",
+                BaseRestDemoCatchAllApiController,
+            ),
+            controllers,
+        )
 
     def test_controller_routes(self):
         # check that the generic routes are defined with the right url and auth
@@ -77,3 +90,42 @@ class TestController(CommonCase):
             auth="public",
             root_path="/base_rest_demo_api/public/",
         )
+
+    def test_catch_all_routes(self):
+        members = {"_routing_mode": "catch_all", "_auth_by_method": {"GET": "public"}}
+        RestControllerType._add_catch_all_methods((RestController,), members)
+        self.assertEqual(
+            members["rest_dispatch"].routing,
+            {"routes": ["<path:_rest_path>"], "methods": ["GET"], "auth": "public"},
+        )
+        self.assertEqual(
+            members["rest_dispatch_1"].routing["methods"], ["POST", "PUT", "DELETE"]
+        )
+        self.assertEqual(members["rest_dispatch_1"].routing["auth"], "user")
+
+    def test_resolve_rest_path(self):
+        controller = RestController()
+
+        def resolve(http_method, path):
+            return controller._resolve_rest_path(http_method, path.split("/"))
+
+        self.assertEqual(resolve("GET", "ping"), ("get", "ping", None, None))
+        self.assertEqual(resolve("GET", "ping/search"), ("get", "ping", None, None))
+        self.assertEqual(resolve("GET", "ping/1"), ("get", "ping", 1, None))
+        self.assertEqual(resolve("GET", "ping/1/get"), ("get", "ping", 1, None))
+        self.assertEqual(resolve("POST", "ping"), ("modify", "ping", None, None))
+        self.assertEqual(resolve("POST", "ping/pong"), ("modify", "ping", None, "pong"))
+        self.assertEqual(resolve("POST", "ping/1"), ("modify", "ping", 1, None))
+        self.assertEqual(resolve("POST", "ping/1/pong"), ("modify", "ping", 1, "pong"))
+        self.assertEqual(resolve("PUT", "ping/1"), ("update", "ping", 1, None))
+        self.assertEqual(resolve("DELETE", "ping/1"), ("delete", "ping", 1, None))
+        for http_method, path in (
+            ("GET", "ping/pong"),
+            ("GET", "ping/1/pong"),
+            ("GET", "ping/"),
+            ("GET", "/ping"),
+            ("PUT", "ping"),
+            ("DELETE", "ping/1/delete"),
+        ):
+            with self.assertRaises(NotFound):
+                resolve(http_method, path)
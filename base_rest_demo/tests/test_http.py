@@ -0,0 +1,242 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import datetime
+import decimal
+import json
+from unittest import mock
+
+from odoo.exceptions import UserError
+from odoo.tools import mute_logger
+from odoo.tools.config import config
+
+from odoo.addons.base_rest import http as http_module
+from odoo.addons.base_rest.components.service import StreamedRows
+from odoo.addons.base_rest.core import RestServicesRegistry
+from odoo.addons.base_rest.http import (
+    ClientErrorLogger,
+    HttpRestRequest,
+    JSONCodec,
+    OrjsonCodec,
+    get_json_codec,
+    orjson,
+)
+
+from .common import CommonCase
+
+
+class TestHttpRestRequest(CommonCase):
+    def setUp(self):
+        super(TestHttpRestRequest, self).setUp()
+        # the methods resolving the lang don't rely on the http request
+        self.rest_request = HttpRestRequest.__new__(HttpRestRequest)
+
+    def test_accepted_locale(self):
+        locales = {"en_US", "fr_FR", "fr_BE"}
+        by_lang = {"en": ["en_US"], "fr": ["fr_FR", "fr_BE"]}
+        get_locale = self.rest_request._get_accepted_locale
+        self.assertEqual(get_locale("fr-BE,en;q=0.8", locales, by_lang), "fr_BE")
+        self.assertEqual(get_locale("fr-CA,en;q=0.8", locales, by_lang), "fr_FR")
+        self.assertEqual(get_locale("de,en-GB;q=0.8", locales, by_lang), "en_US")
+        self.assertIsNone(get_locale("de", locales, by_lang))
+
+    def test_cached_accepted_locale(self):
+        services_registry = RestServicesRegistry()
+        get_locale = self.rest_request._get_cached_accepted_locale
+        self.assertEqual(get_locale(services_registry, self.env, "en-GB"), "en_US")
+        self.assertEqual(services_registry.accept_language_cache["en-GB"], "en_US")
+        installed = services_registry.installed_locales[0]
+        self.assertIsNone(get_locale(services_registry, self.env, "zz"))
+        self.assertIsNone(get_locale(services_registry, self.env, "zz"))
+        self.assertIs(services_registry.installed_locales[0], installed)
+        # the cache is dropped when the installed languages change
+        self.env["res.lang"].clear_caches()
+        get_locale(services_registry, self.env, "en-GB")
+        self.assertIsNot(services_registry.installed_locales[0], installed)
+        self.assertNotIn("zz", services_registry.accept_language_cache)
+
+    def test_match_root_path(self):
+        services_registry = RestServicesRegistry()
+        services_registry["/api/"] = {"root_path": "/api/", "collection_name": "a"}
+        self.assertEqual(services_registry.match_root_path("/api/ping"), "/api/")
+        self.assertIsNone(services_registry.match_root_path("/web/login"))
+        # the trie is rebuilt when a root path is registered
+        services_registry["/api/v2/"] = {
+            "root_path": "/api/v2/",
+            "collection_name": "b",
+        }
+        self.assertEqual(services_registry.match_root_path("/api/v2/ping"), "/api/v2/")
+        self.assertEqual(services_registry.match_root_path("/api/v3/ping"), "/api/")
+        self.assertIsNone(services_registry.match_root_path("/api"))
+
+
+class TestClientErrorLogger(CommonCase):
+    def test_rate_limited(self):
+        error_logger = ClientErrorLogger(period=3600)
+        self.addCleanup(error_logger.flush)
+        key = (404, "GET", "NotFound")
+        with self.assertLogs("odoo.addons.base_rest.http", "INFO") as logs:
+            for __ in range(3):
+                error_logger.log(key, "Not found %s", "/ping")
+            error_logger.log((400, "GET", "BadRequest"), "Bad request")
+        self.assertEqual(
+            logs.output,
+            [
+                "INFO:odoo.addons.base_rest.http:Not found /ping",
+                "INFO:odoo.addons.base_rest.http:Bad request",
+            ],
+        )
+        # the counts are logged once the period is over
+        error_logger.period = 0
+        with self.assertLogs("odoo.addons.base_rest.http", "INFO") as logs:
+            error_logger.log(key, "Not found %s", "/ping")
+        self.assertEqual(
+            logs.output,
+            [
+                "INFO:odoo.addons.base_rest.http:"
+                "3 client errors 404 GET NotFound during the last 0s",
+                "INFO:odoo.addons.base_rest.http:Not found /ping",
+            ],
+        )
+
+    def test_flush(self):
+        error_logger = ClientErrorLogger(period=3600)
+        self.addCleanup(error_logger.flush)
+        key = (404, "GET", "NotFound")
+        with self.assertLogs("odoo.addons.base_rest.http", "INFO") as logs:
+            for __ in range(2):
+                error_logger.log(key, "Not found %s", "/ping")
+            # the counts are logged without waiting for a next error
+            error_logger.flush()
+        self.assertEqual(
+            logs.output,
+            [
+                "INFO:odoo.addons.base_rest.http:Not found /ping",
+                "INFO:odoo.addons.base_rest.http:"
+                "2 client errors 404 GET NotFound during the last 3600s",
+            ],
+        )
+
+    def test_flush_timer(self):
+        error_logger = ClientErrorLogger(period=3600)
+        self.addCleanup(error_logger.flush)
+        key = (404, "GET", "NotFound")
+        with self.assertLogs("odoo.addons.base_rest.http", "INFO") as logs:
+            error_logger.log(key, "Not found %s", "/ping")
+            error_logger.log(key, "Not found %s", "/ping")
+            # a timer flushes the counts at the end of the period
+            timer = error_logger._timer
+            self.assertTrue(timer.is_alive())
+            self.assertAlmostEqual(timer.interval, 3600, delta=60)
+            self.assertEqual(timer.function, error_logger.flush)
+            timer.cancel()
+            timer.function()
+        self.assertIsNone(error_logger._timer)
+        self.assertEqual(
+            logs.output[-1],
+            "INFO:odoo.addons.base_rest.http:"
+            "2 client errors 404 GET NotFound during the last 3600s",
+        )
+
+
+class TestStreamJson(CommonCase):
+    def setUp(self):
+        super(TestStreamJson, self).setUp()
+        self.rest_request = HttpRestRequest.__new__(HttpRestRequest)
+        # a chunk by row
+        self.rest_request._stream_buffer_size = 1
+        self.partner = self.env.ref("base.res_partner_1")
+
+    def _stream_json(self, streamed):
+        chunks = self.rest_request._stream_json(
+            streamed, self.env.cr.dbname, self.env.uid, {}
+        )
+        return json.loads(b"".join(chunks).decode("utf-8"))
+
+    def test_stream_json(self):
+        def rows(env):
+            # the rows are read with the environment of the response
+            self.assertIsNot(env.cr, self.env.cr)
+            partners = env["res.partner"].browse(self.partner.ids)
+            return ({"id": p.id, "name": p.name} for p in partners)
+
+        document = self._stream_json(StreamedRows(rows, count=1))
+        self.assertEqual(
+            document,
+            {"count": 1, "rows": [{"id": self.partner.id, "name": self.partner.name}]},
+        )
+
+    @mute_logger("odoo.addons.base_rest.http")
+    def test_stream_json_error(self):
+        def rows(env):
+            yield {"id": self.partner.id}
+            raise UserError("Streaming error")
+
+        document = self._stream_json(StreamedRows(rows, count=2))
+        self.assertEqual(document["count"], 2)
+        self.assertEqual(document["rows"], [{"id": self.partner.id}])
+        self.assertEqual(document["error"]["code"], 400)
+
+        def no_rows(env):
+            raise UserError("Streaming error")
+
+        document = self._stream_json(StreamedRows(no_rows, count=2))
+        self.assertEqual(list(document), ["error"])
+
+
+class TestJsonCodec(CommonCase):
+    def _get_codecs(self):
+        codecs = [JSONCodec()]
+        if orjson:
+            codecs.append(OrjsonCodec())
+        return codecs
+
+    def test_dumps(self):
+        documents = [
+            {"a": [1, "é", None, True, 1.5]},
+            {"date": datetime.date(2020, 1, 2), "amount": decimal.Decimal("1.5")},
+            {"big": 2 ** 70, "negative": -(2 ** 64)},
+            {1: "int key", None: "null key", False: "bool key", 1.5: "float key"},
+            {"surrogate": "\ud800"},
+        ]
+        for codec in self._get_codecs():
+            for document in documents:
+                self.assertEqual(
+                    json.loads(codec.dumps(document).decode("utf-8")),
+                    json.loads(JSONCodec().dumps(document).decode("utf-8")),
+                    "%s: %s" % (codec.name, document),
+                )
+            with self.assertRaises(TypeError):
+                codec.dumps({"a": {1}})
+            with self.assertRaises(TypeError):
+                codec.dumps({(1, 2): "tuple key"})
+
+    def test_loads(self):
+        documents = [
+            b'{"a": [1, "\\u00e9", null, true, 1.5]}',
+            b'{"big": 123456789012345678901234567890, "small": 1}',
+            '{"big": -18446744073709551616}',
+            b'{"nan": NaN, "infinity": Infinity, "overflow": 1e400}',
+            b'{"surrogate": "\\ud800"}',
+        ]
+        for codec in self._get_codecs():
+            for document in documents:
+                # NaN is not equal to itself
+                self.assertEqual(
+                    repr(codec.loads(document)),
+                    repr(json.loads(document)),
+                    "%s: %s" % (codec.name, document),
+                )
+            self.assertIsInstance(codec.loads(documents[1])["big"], int)
+            with self.assertRaises(ValueError):
+                codec.loads(b'{"a": ')
+
+    def test_get_json_codec(self):
+        with mock.patch.dict(http_module._json_codecs, clear=True):
+            with mock.patch.object(config, "get_misc", return_value="json"):
+                self.assertIsInstance(get_json_codec(), JSONCodec)
+                self.assertNotIsInstance(get_json_codec(), OrjsonCodec)
+            with mock.patch.object(config, "get_misc", return_value="unknown"):
+                self.assertEqual(get_json_codec().name, "json")
+            with mock.patch.object(config, "get_misc", return_value="auto"):
+                self.assertEqual(get_json_codec().name, "orjson" if orjson else "json")
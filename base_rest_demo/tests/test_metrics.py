@@ -0,0 +1,145 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+import os
+import tempfile
+
+import odoo.tests.common
+import odoo.tools
+from odoo.tests import HttpCase
+from odoo.tools.config import config
+
+from odoo.addons.base_rest import metrics as metrics_module
+from odoo.addons.base_rest.metrics import OVERFLOW_KEY, SharedMetrics
+from odoo.addons.base_rest.tests.common import RegistryMixin
+
+
+@odoo.tests.common.at_install(False)
+@odoo.tests.common.post_install(True)
+class TestMetrics(HttpCase, RegistryMixin):
+    @classmethod
+    def setUpClass(cls):
+        super(TestMetrics, cls).setUpClass()
+        cls.setUpRegistry()
+        host = "127.0.0.1"
+        port = odoo.tools.config["http_port"]
+        cls.base_url = "http://%s:%d" % (host, port)
+
+    def setUp(self):
+        super(TestMetrics, self).setUp()
+        fd, self.path = tempfile.mkstemp(suffix=".metrics")
+        os.close(fd)
+        self.addCleanup(os.unlink, self.path)
+
+    def test_shared_metrics(self):
+        metrics = SharedMetrics(self.path, slots=2)
+        metrics.observe("c", "ping", "get", 200, 0.003, sql_count=4)
+        metrics.observe("c", "ping", "get", 404, 0.2)
+        # the counters are shared with the other processes mapping the file
+        other = SharedMetrics(self.path, slots=2)
+        other.observe("c", "ping", "get", 200, 20)
+        other.observe("c", "partner", "get", 200, 0.01)
+        other.observe("c", "partner", "search", 200, 0.01)
+        collected = {labels["service"]: values for labels, *values in other.collect()}
+        self.assertEqual(sorted(collected), sorted(["ping", "partner", OVERFLOW_KEY]))
+        statuses, buckets, count, total, sql_count, *__ = collected["ping"]
+        self.assertEqual(list(statuses), [0, 2, 0, 1, 0])
+        self.assertEqual(buckets[0], 1)
+        self.assertEqual(buckets[-1], 1)
+        self.assertEqual(count, 3)
+        self.assertAlmostEqual(total, 20.203)
+        self.assertEqual(sql_count, 4)
+        # the third key is counted into the overflow slot
+        self.assertEqual(collected[OVERFLOW_KEY][2], 1)
+        text = metrics.render_text()
+        self.assertIn(
+            'base_rest_requests_total{collection="c",service="ping",method="get",'
+            'status="2xx"} 2',
+            text,
+        )
+        self.assertIn(
+            'base_rest_request_duration_seconds_bucket{collection="c",'
+            'service="ping",method="get",le="+Inf"} 3',
+            text,
+        )
+
+    def test_shared_metrics_output_validation_failures(self):
+        metrics = SharedMetrics(self.path, slots=2)
+        metrics.observe_output_validation_failure("c", "ping", "get")
+        metrics.observe_output_validation_failure("c", "ping", "get")
+        collected = metrics.collect()
+        self.assertEqual(len(collected), 1)
+        labels, __, __, count, *__, failures = collected[0]
+        self.assertEqual(labels["service"], "ping")
+        self.assertEqual(count, 0)
+        self.assertEqual(failures, 2)
+        self.assertIn(
+            'base_rest_output_validation_failures_total{collection="c",'
+            'service="ping",method="get"} 2',
+            metrics.render_text(),
+        )
+
+    def test_shared_metrics_other_layout(self):
+        metrics = SharedMetrics(self.path, slots=2)
+        metrics.observe("c", "ping", "get", 200, 0.003)
+        # the file is replaced, not truncated: the first mapping stays valid
+        other = SharedMetrics(self.path, slots=4)
+        self.assertEqual(other.collect(), [])
+        metrics.observe("c", "ping", "get", 200, 0.003)
+        self.assertEqual(len(metrics.collect()), 1)
+        self.assertEqual(os.path.getsize(self.path), other.size)
+
+    def test_metrics_endpoint(self):
+        url = "%s/base_rest/metrics" % self.base_url
+        response = self.opener.get(url)
+        self.assertEqual(response.status_code, 404)
+        options = config.misc.setdefault("base_rest", {})
+        self.addCleanup(options.pop, "metrics_file", None)
+        self.addCleanup(setattr, metrics_module, "_metrics", None)
+        options["metrics_file"] = self.path
+        response = self.opener.get(
+            "%s/base_rest_demo_api/public/ping/1?message=m" % self.base_url
+        )
+        self.assertEqual(response.status_code, 200)
+        # the metrics are not served without token
+        response = self.opener.get(url)
+        self.assertEqual(response.status_code, 403)
+        self.addCleanup(options.pop, "metrics_token", None)
+        options["metrics_token"] = "secret"
+        response = self.opener.get(url, headers={"Authorization": "Bearer wrong"})
+        self.assertEqual(response.status_code, 403)
+        response = self.opener.get(url, headers={"Authorization": "Bearer secret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'base_rest_requests_total{collection="base.rest.demo.public.services",'
+            'service="ping",method="get",status="2xx"} 1',
+            response.text,
+        )
+
+    @odoo.tools.mute_logger(
+        "odoo.addons.base_rest.controllers.main", "odoo.addons.base_rest.http"
+    )
+    def test_metrics_unknown_method(self):
+        options = config.misc.setdefault("base_rest", {})
+        self.addCleanup(options.pop, "metrics_file", None)
+        self.addCleanup(setattr, metrics_module, "_metrics", None)
+        options["metrics_file"] = self.path
+        self.opener.headers["Content-Type"] = "application/json"
+        for method_name in ("bogus1", "bogus2"):
+            response = self.url_open(
+                "%s/base_rest_demo_api/public/ping/%s" % (self.base_url, method_name),
+                "{}",
+            )
+            self.assertEqual(response.status_code, 404)
+        # the names given by the url are not used as labels before they are
+        # resolved
+        labels = [labels for labels, *__ in metrics_module.get_metrics().collect()]
+        self.assertEqual(
+            labels,
+            [
+                {
+                    "collection": "base.rest.demo.public.services",
+                    "service": "_unknown",
+                    "method": "_unknown",
+                }
+            ],
+        )
@@ -0,0 +1,300 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import os
+import tempfile
+from unittest import mock
+
+from werkzeug.exceptions import NotFound
+
+from odoo.exceptions import UserError
+from odoo.tools.config import config
+
+from odoo.addons.base_rest import metrics as metrics_module
+from odoo.addons.base_rest.components.service import (
+    StreamedRows,
+    parse_output_validation,
+)
+from odoo.addons.base_rest.sql_tracking import QueryTracker
+
+from .common import CommonCase
+
+
+class TestService(CommonCase):
+    def test_dispatch_table(self):
+        ping_service = self.public_services_env.component(usage="ping")
+        dispatch_table = ping_service._get_dispatch_table()
+        self.assertEqual(
+            sorted(dispatch_table), ["create", "delete", "get", "search", "update"]
+        )
+        search = dispatch_table["search"]
+        self.assertFalse(search.skip_secure_params)
+        self.assertFalse(search.skip_secure_response)
+        self.assertEqual(search.input_validator.schema["limit"]["default"], 50)
+        # the dispatch table is computed once by component
+        self.assertIs(
+            self.public_services_env.component(usage="ping")._get_dispatch_table(),
+            dispatch_table,
+        )
+
+    def test_validators_cache(self):
+        ping_service = self.public_services_env.component(usage="ping")
+        validator = ping_service._get_input_validator("search")
+        # the validators of the services declaring static schemas are cached
+        self.assertIs(ping_service._get_input_validator("search"), validator)
+        self.assertIs(
+            self.public_services_env.component(usage="ping")._get_input_validator(
+                "search"
+            ),
+            validator,
+        )
+        # the other validators are built for each call
+        ping_service._static_validators = False
+        other_validator = ping_service._get_input_validator("search")
+        self.assertIsNot(other_validator, validator)
+        self.assertIsNot(ping_service._get_input_validator("search"), other_validator)
+        self.assertEqual(
+            ping_service.dispatch("get", 1, {"message": "hello"}),
+            {"message": "hello", "id": 1},
+        )
+        # the cache is invalidated when the registry is rebuilt
+        self.setUpRegistry()
+        ping_service = self.public_services_env.component(usage="ping")
+        new_validator = ping_service._get_input_validator("search")
+        self.assertIsNot(new_validator, validator)
+        self.assertIs(ping_service._get_input_validator("search"), new_validator)
+
+    def test_row_validators_cache(self):
+        partner_service = self.private_services_env.component(usage="partner")
+        validator = partner_service._get_output_row_validator("export")
+        self.assertIsNotNone(validator)
+        self.assertIs(partner_service._get_output_row_validator("export"), validator)
+        partner_service._static_validators = False
+        self.assertIsNot(partner_service._get_output_row_validator("export"), validator)
+
+    def test_dispatch(self):
+        ping_service = self.public_services_env.component(usage="ping")
+        res = ping_service.dispatch("get", 1, {"message": "hello"})
+        self.assertEqual(res, {"message": "hello", "id": 1})
+        with self.assertRaises(NotFound):
+            ping_service.dispatch("_validator_get", params={})
+        with self.assertRaises(NotFound):
+            ping_service.dispatch("dispatch", params={})
+
+    def test_streamed_rows(self):
+        partner = self.env["res.partner"].create(
+            {
+                "name": "Streamed partner",
+                "street": "Street",
+                "zip": "1000",
+                "city": "City",
+                "country_id": self.env.ref("base.be").id,
+            }
+        )
+        partner_service = self.private_services_env.component(usage="partner")
+        res = partner_service.dispatch("export", params={"name": "Streamed partner"})
+        self.assertIsInstance(res, StreamedRows)
+        self.assertTrue(res.is_deferred)
+        self.assertEqual(res.envelope, {"count": 1})
+        rows = list(res.iter_rows(self.env))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["id"], partner.id)
+        self.assertEqual(rows[0]["country"]["name"], partner.country_id.name)
+
+    def test_streamed_rows_invalid_row(self):
+        partner_service = self.private_services_env.component(usage="partner")
+        streamed = partner_service._secure_output(
+            "export", StreamedRows(iter([{"id": 1}]), count=1)
+        )
+        with self.assertRaises(SystemError):
+            list(streamed.iter_rows(self.env))
+        streamed = partner_service._secure_output(
+            "export", StreamedRows(lambda env: iter([{"id": 1}]), count=1)
+        )
+        self.assertTrue(streamed.is_deferred)
+        with self.assertRaises(SystemError):
+            list(streamed.iter_rows(self.env))
+
+    def test_search_batched(self):
+        partners = self.env["res.partner"].create(
+            [{"name": "Batched partner %d" % i} for i in range(5)]
+        )
+        partner_service = self.private_services_env.component(usage="partner")
+        rows = list(
+            partner_service._search_batched(
+                "res.partner",
+                [("name", "like", "Batched partner")],
+                fields=["name"],
+                batch_size=2,
+            )
+        )
+        self.assertEqual([row["id"] for row in rows], partners.ids)
+        self.assertEqual(rows[0]["name"], "Batched partner 0")
+        partners.invalidate_cache()
+        records = []
+        for record in partner_service._search_batched(
+            "res.partner", [("name", "like", "Batched partner")], batch_size=3
+        ):
+            # the fields of the records of the batch are read at once
+            self.assertTrue(self.env.cache.contains(record, record._fields["name"]))
+            records.append(record)
+        self.assertEqual([r.id for r in records], partners.ids)
+
+    def test_dispatch_batched(self):
+        partner_service = self.private_services_env.component(usage="partner")
+        self.assertEqual(
+            partner_service._get_dispatch_table()["export"].batched,
+            {"batch_size": 200},
+        )
+        self.assertEqual(partner_service._get_batch_size("export"), 200)
+        self.assertEqual(partner_service._get_batch_size("search"), 500)
+        with mock.patch.object(
+            type(partner_service), "_search_batched", autospec=True
+        ) as search_batched:
+            search_batched.return_value = iter([])
+            res = partner_service.dispatch("export", params={"name": "Batched"})
+            self.assertEqual(list(res.iter_rows(self.env)), [])
+        self.assertEqual(search_batched.call_args[1]["batch_size"], 200)
+        # the batch size of the method is not kept by the service
+        self.assertEqual(partner_service._batch_size, 500)
+
+    def test_keyset_pagination(self):
+        partners = self.env["res.partner"].create(
+            [{"name": "Paginated partner %d" % i} for i in range(5)]
+        )
+        partner_service = self.private_services_env.component(usage="partner")
+        domain = [("name", "like", "Paginated partner")]
+        records, cursor = partner_service._paginate("res.partner", domain, 2)
+        self.assertEqual(records, partners[:2])
+        records, cursor = partner_service._paginate("res.partner", domain, 2, cursor)
+        self.assertEqual(records, partners[2:4])
+        records, cursor = partner_service._paginate("res.partner", domain, 2, cursor)
+        self.assertEqual(records, partners[4:])
+        self.assertIsNone(cursor)
+        # sort on another field
+        records, cursor = partner_service._paginate(
+            "res.partner", domain, 3, sort_field="name"
+        )
+        self.assertEqual(records, partners[:3])
+        records, cursor = partner_service._paginate(
+            "res.partner", domain, 3, cursor, sort_field="name"
+        )
+        self.assertEqual(records, partners[3:])
+        self.assertIsNone(cursor)
+        with self.assertRaises(UserError):
+            partner_service._paginate("res.partner", domain, 2, "invalid")
+        # the order of a many2one and the keyset domain on its column differ
+        with self.assertRaises(ValueError):
+            partner_service._paginate("res.partner", domain, 2, sort_field="parent_id")
+
+    def test_search_paginated(self):
+        self.env["res.partner"].create(
+            [
+                {
+                    "name": "Paginated partner %d" % i,
+                    "street": "Street",
+                    "zip": "1000",
+                    "city": "City",
+                }
+                for i in range(3)
+            ]
+        )
+        partner_service = self.private_services_env.component(usage="partner")
+        input_validator = partner_service._get_input_validator("search")
+        self.assertFalse(input_validator.validate({"name": "x", "limit": 1000}))
+        res = partner_service.dispatch(
+            "search", params={"name": "Paginated partner", "limit": "2"}
+        )
+        self.assertEqual(res["count"], 3)
+        self.assertEqual(len(res["rows"]), 2)
+        self.assertTrue(res["next_cursor"])
+        res = partner_service.dispatch(
+            "search",
+            params={"name": "Paginated partner", "cursor": res["next_cursor"]},
+        )
+        self.assertEqual(len(res["rows"]), 1)
+        self.assertIsNone(res["next_cursor"])
+        # the partners are only counted for the first page
+        self.assertNotIn("count", res)
+
+    def _set_output_validation(self, service, method_name, policy):
+        dispatch_table = service._get_dispatch_table()
+        service_method = dispatch_table[method_name]
+        dispatch_table[method_name] = service_method._replace(
+            output_validation=parse_output_validation(policy)
+        )
+        self.addCleanup(dispatch_table.__setitem__, method_name, service_method)
+
+    def test_parse_output_validation(self):
+        self.assertEqual(parse_output_validation(None), ("always", 1))
+        self.assertEqual(parse_output_validation("off"), ("off", 1))
+        self.assertEqual(parse_output_validation("sample:10"), ("sample", 10))
+        for policy in ("sample", "sample:0", "sample:x", "off:2", "never"):
+            with self.assertRaises(ValueError):
+                parse_output_validation(policy)
+
+    def test_output_validation_sampled(self):
+        ping_service = self.public_services_env.component(usage="ping")
+        self.assertEqual(
+            ping_service._get_dispatch_table()["get"].output_validation,
+            ("always", 1),
+        )
+        with self.assertRaises(SystemError):
+            ping_service._secure_output("get", {"id": "one"})
+        self._set_output_validation(ping_service, "get", "sample:1")
+        fd, path = tempfile.mkstemp(suffix=".metrics")
+        os.close(fd)
+        self.addCleanup(os.unlink, path)
+        options = config.misc.setdefault("base_rest", {})
+        self.addCleanup(options.pop, "metrics_file", None)
+        self.addCleanup(setattr, metrics_module, "_metrics", None)
+        options["metrics_file"] = path
+        response = {"id": "one"}
+        self.assertIs(ping_service._secure_output("get", response), response)
+        # the invalid response is counted into the metrics
+        ((labels, *__, failures),) = metrics_module.get_metrics().collect()
+        self.assertEqual(
+            labels,
+            {
+                "collection": "base.rest.demo.public.services",
+                "service": "ping",
+                "method": "get",
+            },
+        )
+        self.assertEqual(failures, 1)
+
+    def test_output_validation_off(self):
+        partner_service = self.private_services_env.component(usage="partner")
+        self._set_output_validation(partner_service, "search", "off")
+        response = {"count": 1, "rows": [{"id": "one"}]}
+        self.assertIs(partner_service._secure_output("search", response), response)
+        with self.assertRaises(SystemError):
+            partner_service._secure_output("search", {"rows": []})
+        with self.assertRaises(SystemError):
+            partner_service._secure_output("search", [])
+
+    def test_query_tracker(self):
+        cr = self.env.cr
+        with QueryTracker(cr) as tracker:
+            cr.execute("SELECT 1")
+            cr.execute("SELECT  2")
+            cr.execute("SELECT name FROM res_partner WHERE id IN (1, 2)")
+        self.assertNotIn("execute", cr.__dict__)
+        self.assertEqual(tracker.count, 3)
+        self.assertEqual([r[:2] for r in tracker.get_repeated(1)], [("SELECT ?", 2)])
+        self.assertIn(
+            "SELECT name FROM res_partner WHERE id IN (?)", tracker.statements
+        )
+
+    def test_repeated_queries_warning(self):
+        partner = self.env["res.partner"].create({"name": "Tracked partner"})
+        options = config.misc.setdefault("base_rest", {})
+        self.addCleanup(options.pop, "sql_tracking", None)
+        self.addCleanup(options.pop, "sql_repeat_threshold", None)
+        options.update({"sql_tracking": "True", "sql_repeat_threshold": "0"})
+        partner_service = self.private_services_env.component(usage="partner")
+        with self.assertLogs(
+            "odoo.addons.base_rest.components.service", "WARNING"
+        ) as logs:
+            partner_service.dispatch("get", partner.id)
+        self.assertIn("Method get of service", logs.output[0])
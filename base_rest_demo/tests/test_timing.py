@@ -0,0 +1,76 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+import odoo.tests.common
+import odoo.tools
+from odoo.tests import HttpCase
+from odoo.tools.config import config
+
+from odoo.addons.base_rest.tests.common import RegistryMixin
+from odoo.addons.base_rest.timing import PhaseTimer
+
+
+@odoo.tests.common.at_install(False)
+@odoo.tests.common.post_install(True)
+class TestServerTiming(HttpCase, RegistryMixin):
+    @classmethod
+    def setUpClass(cls):
+        super(TestServerTiming, cls).setUpClass()
+        cls.setUpRegistry()
+        host = "127.0.0.1"
+        port = odoo.tools.config["http_port"]
+        cls.url = "http://%s:%d/base_rest_demo_api/public" % (host, port)
+
+    def test_phase_timer(self):
+        timer = PhaseTimer()
+        with timer.phase("method"):
+            pass
+        timer.add("method", 0.5)
+        timer.add("output", 0.25)
+        self.assertGreaterEqual(timer.phases["method"], 0.5)
+        self.assertEqual(timer.as_ms()["output"], 250.0)
+        self.assertTrue(timer.to_header().endswith("output;dur=250.000"))
+
+    def test_server_timing_disabled(self):
+        response = self.opener.get("%s/ping/1?message=m" % self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Server-Timing", response.headers)
+
+    def test_server_timing(self):
+        options = config.misc.setdefault("base_rest", {})
+        self.addCleanup(options.pop, "server_timing", None)
+        options["server_timing"] = "True"
+        response = self.opener.get("%s/ping/1?message=m" % self.url)
+        self.assertEqual(response.status_code, 200)
+        phases = [
+            value.split(";")[0].strip()
+            for value in response.headers["Server-Timing"].split(",")
+        ]
+        self.assertEqual(
+            phases, ["parse", "lang", "cache", "input", "method", "output", "response"]
+        )
+
+    def test_server_timing_streamed_rows(self):
+        options = config.misc.setdefault("base_rest", {})
+        self.addCleanup(options.pop, "server_timing", None)
+        options["server_timing"] = "True"
+        self.authenticate("admin", "admin")
+        partner = self.env.ref("base.res_partner_1")
+        url = self.url.replace("/public", "/private")
+        response = self.opener.post(
+            "%s/partner/export" % url,
+            json={"name": partner.name},
+            headers={"Accept-Encoding": "identity"},
+        )
+        self.assertEqual(response.status_code, 200)
+        # the rows are streamed once the request is processed
+        self.assertNotIn("Content-Length", response.headers)
+        self.assertIn(partner.id, [row["id"] for row in response.json()["rows"]])
+        self.assertIn("response;dur=", response.headers["Server-Timing"])
+        # the streamed rows are compressed chunk by chunk
+        response = self.opener.post(
+            "%s/partner/export" % url,
+            json={"name": partner.name},
+            headers={"Accept-Encoding": "gzip"},
+        )
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn(partner.id, [row["id"] for row in response.json()["rows"]])
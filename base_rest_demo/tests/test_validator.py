@@ -0,0 +1,115 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import copy
+import threading
+
+from cerberus import Validator
+
+from odoo.addons.base_rest.validator import (
+    CompiledValidator,
+    ThreadLocalValidator,
+    compile_validator,
+)
+
+from .common import CommonCase
+
+
+class TestCompiledValidator(CommonCase):
+    def _assert_same_result(self, schema, document):
+        validator = Validator(schema, purge_unknown=True)
+        compiled = compile_validator(Validator(schema, purge_unknown=True))
+        self.assertIsInstance(compiled, CompiledValidator)
+        res = validator.validate(copy.deepcopy(document))
+        compiled_res = compiled.validate(copy.deepcopy(document))
+        self.assertEqual(res, compiled_res)
+        self.assertEqual(validator.document, compiled.document)
+        self.assertEqual(validator.errors, compiled.errors)
+
+    def test_partner_create(self):
+        service = self.private_services_env.component(usage="partner")
+        schema = service._validator_create()
+        documents = [
+            {
+                "name": "Jo",
+                "street": "Street",
+                "zip": "1000",
+                "city": "City",
+                "country": {"id": "1"},
+                "state": {"id": None},
+                "is_company": "true",
+                "unknown": 1,
+            },
+            {"name": "", "street": "Street", "zip": "1000", "city": "City"},
+            {"name": "Jo", "country": {"id": "not an int"}},
+            {"name": None, "phone": ""},
+            {},
+        ]
+        for document in documents:
+            self._assert_same_result(schema, document)
+
+    def test_partner_search_return(self):
+        service = self.private_services_env.component(usage="partner")
+        schema = service._validator_return_search()
+        row = {
+            "id": 1,
+            "name": "Jo",
+            "street": "Street",
+            "zip": "1000",
+            "city": "City",
+            "country": {"id": 1, "name": "Belgium"},
+        }
+        documents = [
+            {"count": 1, "rows": [row]},
+            {"count": 1, "rows": [dict(row, id=None)]},
+            {"count": "1", "rows": []},
+            {"count": 1, "rows": "no list"},
+        ]
+        for document in documents:
+            self._assert_same_result(schema, document)
+
+    def test_ping_search(self):
+        service = self.public_services_env.component(usage="ping")
+        schema = service._validator_search()
+        documents = [
+            {"param_required": "x", "limit": "10", "params": ["a"]},
+            {"param_required": "x", "limit": None},
+            {"param_required": 1, "offset": "x"},
+            {"limit": "10"},
+        ]
+        for document in documents:
+            self._assert_same_result(schema, document)
+
+    def test_unsupported_schema(self):
+        validator = Validator({"a": {"type": "string", "oneof_regex": ["a"]}})
+        self.assertIsNone(compile_validator(validator))
+
+
+class TestThreadLocalValidator(CommonCase):
+    def test_validator_subclass(self):
+        class ExtraValidator(Validator):
+            def __init__(self, schema, extra, **kwargs):
+                super(ExtraValidator, self).__init__(schema, **kwargs)
+                self.extra = extra
+
+        validator = ThreadLocalValidator(
+            ExtraValidator({"a": {"type": "integer", "coerce": int}}, "extra")
+        )
+        results = {}
+
+        def validate(value):
+            res = validator.validate({"a": value})
+            results[value] = (res, validator.document, validator.errors)
+
+        threads = [threading.Thread(target=validate, args=(v,)) for v in ("1", "x")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results["1"], (True, {"a": 1}, {}))
+        self.assertFalse(results["x"][0])
+        self.assertIn("a", results["x"][2])
+        # each thread uses its own copy of the wrapped validator
+        self.assertTrue(validator.validate({"a": "2"}))
+        self.assertEqual(validator.document, {"a": 2})
+        self.assertEqual(validator.extra, "extra")
@@ -1,5 +1,6 @@
 # Copyright 2018 ACSONE SA/NV
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
+from . import models
 from .controllers import GraphQLControllerMixin
 from .types import OdooObjectType
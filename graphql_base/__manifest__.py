@@ -5,12 +5,16 @@
     "name": "Graphql Base",
     "summary": """
         Base GraphQL/GraphiQL controller""",
-    "version": "12.0.1.0.0",
+    "version": "12.0.1.1.0",
     "license": "LGPL-3",
     "author": "ACSONE SA/NV,Odoo Community Association (OCA)",
     "website": "https://github.com/OCA/rest-framework",
     "depends": ["base"],
-    "data": ["views/graphiql.xml"],
+    "data": [
+        "security/ir.model.access.csv",
+        "views/graphiql.xml",
+        "views/graphql_persisted_query.xml",
+    ],
     "external_dependencies": {"python": ["graphene", "graphql_server"]},
     "development_status": "Beta",
     "maintainers": ["sbidoul"],
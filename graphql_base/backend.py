@@ -0,0 +1,140 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+"""
+
+GraphQL Document Cache
+======================
+
+The queries received by the GraphQL controllers are parsed and validated
+against their schema once: the valid documents are kept into a LRU cache
+shared by the controllers of the worker.
+
+The cache is configured by the section '[graphql_base]' of the server config
+file:
+
+* 'document_cache_entries': max number of cached documents (512 by default,
+  0 disables the cache)
+* 'document_cache_size': max total size of the cached queries in characters
+  (2097152 by default)
+
+"""
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from graphql.backend.base import GraphQLDocument
+from graphql.backend.core import GraphQLCoreBackend
+from graphql.execution import ExecutionResult, execute
+from graphql.language import ast
+from graphql.language.base import parse
+from graphql.validation import validate
+
+from odoo.tools.config import config
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_MAX_SIZE = 2 * 1024 * 1024
+
+
+class LRUCachedBackend(GraphQLCoreBackend):
+    """A GraphQL backend caching the parsed and validated documents.
+
+    The default backend parses the query and validates it against the schema
+    for each request. This backend keeps the valid documents by (schema,
+    query) in a LRU cache so the execution of a known query starts from its
+    validated AST. The cache is bounded by a number of documents and by the
+    total size (in characters) of their queries. The invalid documents are
+    not cached.
+    """
+
+    def __init__(
+        self, max_entries=DEFAULT_MAX_ENTRIES, max_size=DEFAULT_MAX_SIZE, executor=None
+    ):
+        super(LRUCachedBackend, self).__init__(executor=executor)
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def document_from_string(self, schema, document_string):
+        if isinstance(document_string, ast.Document):
+            return super(LRUCachedBackend, self).document_from_string(
+                schema, document_string
+            )
+        key = (schema, document_string)
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+                self.hits += 1
+                return document
+            self.misses += 1
+        document_ast = parse(document_string)
+        validation_errors = validate(schema, document_ast)
+        if validation_errors:
+            return GraphQLDocument(
+                schema=schema,
+                document_string=document_string,
+                document_ast=document_ast,
+                execute=partial(_invalid_result, validation_errors),
+            )
+        document = GraphQLDocument(
+            schema=schema,
+            document_string=document_string,
+            document_ast=document_ast,
+            execute=partial(execute, schema, document_ast, **self.execute_params),
+        )
+        self._add(key, document, len(document_string))
+        return document
+
+    def _add(self, key, document, size):
+        if size > self.max_size or self.max_entries <= 0:
+            return
+        with self._lock:
+            if key in self._documents:
+                return
+            self._documents[key] = document
+            self.size += size
+            while len(self._documents) > self.max_entries or self.size > self.max_size:
+                (__, query), __ = self._documents.popitem(last=False)
+                self.size -= len(query)
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+            self.size = 0
+
+    def stats(self):
+        """Return the statistics of the cache"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._documents),
+            "size": self.size,
+        }
+
+
+def _invalid_result(errors, *args, **kwargs):
+    return ExecutionResult(errors=errors, invalid=True)
+
+
+_backend = None
+
+
+def get_document_backend():
+    """Return the backend caching the documents of the worker"""
+    global _backend
+    if _backend is None:
+        _backend = LRUCachedBackend(
+            max_entries=int(
+                config.get_misc(
+                    "graphql_base", "document_cache_entries", DEFAULT_MAX_ENTRIES
+                )
+            ),
+            max_size=int(
+                config.get_misc("graphql_base", "document_cache_size", DEFAULT_MAX_SIZE)
+            ),
+        )
+    return _backend
@@ -4,6 +4,8 @@
 import re
 from functools import partial
 
+from graphql.error import GraphQLError
+from graphql.execution import ExecutionResult
 from graphql_server import (
     HttpQueryError,
     default_format_error,
@@ -15,22 +17,69 @@ from graphql_server import (
 
 from odoo import http
 
+from ..backend import get_document_backend
+from ..models.graphql_persisted_query import query_hash
+
+# regular expressions of the paths of the GraphQL controllers
+_json_path_patterns = []
+# all these paths into a single regular expression
+_json_paths_re = None
+
+
+def _get_request(orig_get_request):
+    def get_request(self, httprequest):
+        if _json_paths_re is not None and _json_paths_re.match(httprequest.path):
+            return http.HttpRequest(httprequest)
+        return orig_get_request(self, httprequest)
+
+    return get_request
+
+
+class PersistedQueryNotFound(Exception):
+    """The hash of a persisted query sent without its text is unknown"""
+
+
+class _OperationFailed(Exception):
+    """Rollback the savepoint of a failed operation of a batch"""
+
+    def __init__(self, execution_result):
+        super(_OperationFailed, self).__init__(execution_result)
+        self.execution_result = execution_result
+
 
 class GraphQLControllerMixin(object):
+
+    # Support of the persisted queries identified by the sha256 hash of their
+    # text (https://github.com/apollographql/apollo-link-persisted-queries):
+    # - None: the persisted queries are not supported
+    # - "registered": the queries registered into the database can be sent
+    #   with their hash only (with a POST or a GET)
+    # - "auto": as "registered", and the queries sent with their hash are
+    #   registered once successfully executed
+    # - "allow_list": only the queries allowed by an administrator are
+    #   executed, the other queries are rejected
+    _persisted_queries = None
+
+    # Accept the batched requests (a JSON array of operations), each operation
+    # being executed in its own savepoint
+    _batch_enabled = True
+
     @staticmethod
     def patch_for_json(path_re):
         # this is to avoid Odoo, which assumes json always means json+rpc,
         # complaining about "function declared as capable of handling request
         # of type 'http' but called with a request of type 'json'"
-        path_re = re.compile(path_re)
-        orig_get_request = http.Root.get_request
-
-        def get_request(self, httprequest):
-            if path_re.match(httprequest.path):
-                return http.HttpRequest(httprequest)
-            return orig_get_request(self, httprequest)
-
-        http.Root.get_request = get_request
+        global _json_paths_re
+        if path_re in _json_path_patterns:
+            return
+        if not _json_path_patterns:
+            # Root.get_request is patched once for all the GraphQL paths
+            http.Root.get_request = _get_request(http.Root.get_request)
+        _json_path_patterns.append(path_re)
+        # the new regular expression is published once compiled
+        _json_paths_re = re.compile(
+            "|".join("(?:%s)" % pattern for pattern in _json_path_patterns)
+        )
 
     def _parse_body(self):
         req = http.request.httprequest
@@ -48,9 +97,126 @@ class GraphQLControllerMixin(object):
             return http.request.params
         return {}
 
+    def _get_graphql_backend(self):
+        """Return the backend parsing, validating and executing the queries
+        (by default a backend caching the validated documents)"""
+        return get_document_backend()
+
+    def _get_persisted_query_params(self, data, query_data):
+        extensions = data.get("extensions") or query_data.get("extensions")
+        if isinstance(extensions, str):
+            extensions = load_json_body(extensions)
+        persisted_query = (extensions or {}).get("persistedQuery")
+        if persisted_query and persisted_query.get("version") != 1:
+            raise HttpQueryError(400, "Unsupported persisted query version.")
+        query = data.get("query") or query_data.get("query")
+        sha256_hash = persisted_query and persisted_query.get("sha256Hash")
+        return query, sha256_hash
+
+    def _resolve_persisted_query(self, data, query_data):
+        """
+        Return the GraphQL params of a request with the text of its persisted
+        query.
+        :param data: the params of the request
+        :param query_data: the params of the query string
+        :return: a tuple (params of the request with the text of the query,
+                 (hash, query) to register once the query is successfully
+                 executed or None)
+        """
+        mode = self._persisted_queries
+        if not mode or not isinstance(data, dict):
+            return data, None
+        query, sha256_hash = self._get_persisted_query_params(data, query_data)
+        if not sha256_hash and (mode != "allow_list" or not query):
+            return data, None
+        persisted_queries = http.request.env["graphql.persisted.query"].sudo()
+        if query:
+            if sha256_hash and query_hash(query) != sha256_hash:
+                raise HttpQueryError(400, "Provided sha does not match query.")
+            sha256_hash = sha256_hash or query_hash(query)
+        persisted_query = persisted_queries._get_query(sha256_hash)
+        if mode == "allow_list":
+            if persisted_query is None and not query:
+                raise PersistedQueryNotFound()
+            if persisted_query is None or not persisted_query[1]:
+                raise HttpQueryError(403, "Query not allowed.")
+        elif persisted_query is None:
+            if not query:
+                raise PersistedQueryNotFound()
+            if mode == "auto":
+                return data, (sha256_hash, query)
+        if not query:
+            data = dict(data, query=persisted_query[0])
+        return data, None
+
+    def _register_persisted_query(self, to_register):
+        """Register the query of a request once successfully executed"""
+        if to_register:
+            persisted_queries = http.request.env["graphql.persisted.query"].sudo()
+            persisted_queries._register_query(*to_register)
+
+    def _execute_batch_operation(self, schema, operation):
+        """
+        Execute an operation of a batch in a savepoint, rolled back if the
+        operation fails.
+        :param schema: the GraphQL schema
+        :param operation: the params of the operation
+        :return: the ExecutionResult of the operation
+        """
+        env = http.request.env
+        try:
+            with env.cr.savepoint():
+                operation, to_register = self._resolve_persisted_query(operation, {})
+                execution_results, __ = run_http_query(
+                    schema,
+                    http.request.httprequest.method.lower(),
+                    operation,
+                    batch_enabled=False,
+                    catch=False,
+                    backend=self._get_graphql_backend(),
+                    context={"env": env},
+                )
+                execution_result = execution_results[0]
+                if execution_result and execution_result.errors:
+                    raise _OperationFailed(execution_result)
+                self._register_persisted_query(to_register)
+        except _OperationFailed as e:
+            env.clear()
+            return e.execution_result
+        except HttpQueryError as e:
+            env.clear()
+            return ExecutionResult(errors=[e], invalid=True)
+        except PersistedQueryNotFound:
+            error = GraphQLError(
+                "PersistedQueryNotFound",
+                extensions={"code": "PERSISTED_QUERY_NOT_FOUND"},
+            )
+            return ExecutionResult(errors=[error])
+        return execution_result
+
+    def _process_batch_request(self, schema, data):
+        if not data:
+            raise HttpQueryError(400, "Received an empty list in the batch request.")
+        execution_results = [
+            self._execute_batch_operation(schema, operation) for operation in data
+        ]
+        # the status of the response is 200 whatever the outcome of the
+        # operations, the errors of each operation are in its result
+        result, __ = encode_execution_results(
+            execution_results,
+            is_batch=True,
+            format_error=default_format_error,
+            encode=partial(json_encode, pretty=False),
+        )
+        headers = {"Content-Type": "application/json"}
+        return http.request.make_response(result, headers=headers)
+
     def _process_request(self, schema, data):
         try:
+            if isinstance(data, list) and self._batch_enabled:
+                return self._process_batch_request(schema, data)
             request = http.request.httprequest
+            data, to_register = self._resolve_persisted_query(data, request.args)
             execution_results, all_params = run_http_query(
                 schema,
                 request.method.lower(),
@@ -58,6 +224,7 @@ class GraphQLControllerMixin(object):
                 query_data=request.args,
                 batch_enabled=False,
                 catch=False,
+                backend=self._get_graphql_backend(),
                 context={"env": http.request.env},
             )
             result, status_code = encode_execution_results(
@@ -74,6 +241,8 @@ class GraphQLControllerMixin(object):
                 env = http.request.env
                 env.cr.rollback()
                 env.clear()
+            else:
+                self._register_persisted_query(to_register)
             return response
         except HttpQueryError as e:
             result = json_encode({"errors": [default_format_error(e)]})
@@ -85,6 +254,20 @@ class GraphQLControllerMixin(object):
             env.cr.rollback()
             env.clear()
             return response
+        except PersistedQueryNotFound:
+            # the client sends the query again with its text
+            result = json_encode(
+                {
+                    "errors": [
+                        {
+                            "message": "PersistedQueryNotFound",
+                            "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"},
+                        }
+                    ]
+                }
+            )
+            headers = {"Content-Type": "application/json"}
+            return http.request.make_response(result, headers=headers)
 
     def _handle_graphql_request(self, schema):
         data = self._parse_body()
@@ -0,0 +1 @@
+from . import graphql_persisted_query
@@ -0,0 +1,198 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from odoo import api, fields, models, registry
+from odoo.tools.config import config
+
+DEFAULT_CACHE_ENTRIES = 1024
+# max number of queries registered by the clients (the oldest ones are
+# deleted) and max size of a registered query (in characters)
+DEFAULT_MAX_REGISTERED = 10000
+DEFAULT_MAX_QUERY_SIZE = 65536
+
+
+def query_hash(query):
+    """Return the sha256 hash identifying a persisted query"""
+    return hashlib.sha256(query.encode("utf8")).hexdigest()
+
+
+class _QueryCache(object):
+    """LRU cache of the persisted queries found in the database by (database,
+    hash). The cache of a worker is cleared when the registry caches are
+    invalidated (ie when a persisted query is modified or deleted)."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._queries = OrderedDict()
+        self._sequences = {}
+        self._lock = threading.Lock()
+
+    def get(self, dbname, sequence, sha256_hash):
+        with self._lock:
+            if self._sequences.get(dbname) != sequence:
+                self._clear(dbname)
+                self._sequences[dbname] = sequence
+                return None
+            key = (dbname, sha256_hash)
+            value = self._queries.get(key)
+            if value is not None:
+                self._queries.move_to_end(key)
+            return value
+
+    def set(self, dbname, sha256_hash, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._queries[(dbname, sha256_hash)] = value
+            self._queries.move_to_end((dbname, sha256_hash))
+            while len(self._queries) > self.max_entries:
+                self._queries.popitem(last=False)
+
+    def clear(self, dbname):
+        with self._lock:
+            self._clear(dbname)
+
+    def _clear(self, dbname):
+        for key in [key for key in self._queries if key[0] == dbname]:
+            del self._queries[key]
+
+
+_cache = _QueryCache(
+    int(
+        config.get_misc(
+            "graphql_base", "persisted_query_cache_entries", DEFAULT_CACHE_ENTRIES
+        )
+    )
+)
+
+
+class GraphQLPersistedQuery(models.Model):
+    """A GraphQL query identified by the sha256 hash of its text.
+
+    The queries are registered by the GraphQL controllers when a client sends
+    a query with its hash (automatic persisted queries) or by an
+    administrator. In allow-list mode, the controllers only execute the
+    allowed queries.
+    """
+
+    _name = "graphql.persisted.query"
+    _description = "GraphQL Persisted Query"
+    _order = "create_date desc"
+
+    name = fields.Char(string="Hash", required=True, readonly=True, index=True)
+    query = fields.Text(required=True)
+    allowed = fields.Boolean(
+        default=True,
+        help="The allowed queries are accepted by the GraphQL endpoints in "
+        "allow-list mode. The queries registered by the clients are not "
+        "allowed.",
+    )
+
+    _sql_constraints = [
+        ("name_uniq", "unique(name)", "A query with the same hash already exists.")
+    ]
+
+    @api.model
+    def _prepare_values(self, values):
+        if values.get("query"):
+            values = dict(values, name=query_hash(values["query"]))
+        return values
+
+    @api.model
+    def create(self, vals):
+        return super(GraphQLPersistedQuery, self).create(self._prepare_values(vals))
+
+    @api.multi
+    def write(self, vals):
+        res = super(GraphQLPersistedQuery, self).write(self._prepare_values(vals))
+        self._invalidate_query_cache()
+        return res
+
+    @api.multi
+    def unlink(self):
+        res = super(GraphQLPersistedQuery, self).unlink()
+        self._invalidate_query_cache()
+        return res
+
+    @api.model
+    def _invalidate_query_cache(self):
+        _cache.clear(self.env.cr.dbname)
+        # the other workers clear their cache when they see the new sequence
+        # of the registry caches
+        self.clear_caches()
+
+    @api.model
+    def _get_query(self, sha256_hash):
+        """
+        Return the persisted query of the given hash.
+        :param sha256_hash: the sha256 hash of the query
+        :return: a tuple (query, allowed) or None if the query is unknown
+        """
+        dbname = self.env.cr.dbname
+        sequence = self.pool.cache_sequence
+        value = _cache.get(dbname, sequence, sha256_hash)
+        if value is None:
+            self.env.cr.execute(
+                "SELECT query, allowed FROM graphql_persisted_query WHERE name = %s",
+                (sha256_hash,),
+            )
+            row = self.env.cr.fetchone()
+            if row is None:
+                return None
+            value = tuple(row)
+            _cache.set(dbname, sha256_hash, value)
+        return value
+
+    @api.model
+    def _register_query(self, sha256_hash, query):
+        """
+        Register a query sent by a client once successfully executed. The
+        query is committed by a new cursor. The queries bigger than
+        'persisted_query_max_size' are not registered and only the last
+        'persisted_query_max_registered' queries registered by the clients
+        are kept.
+        :param sha256_hash: the sha256 hash of the query
+        :param query: the text of the query
+        """
+        max_size = int(
+            config.get_misc(
+                "graphql_base", "persisted_query_max_size", DEFAULT_MAX_QUERY_SIZE
+            )
+        )
+        max_registered = int(
+            config.get_misc(
+                "graphql_base", "persisted_query_max_registered", DEFAULT_MAX_REGISTERED
+            )
+        )
+        if len(query) > max_size or max_registered <= 0:
+            return
+        with registry(self.env.cr.dbname).cursor() as cr:
+            cr.execute(
+                """
+                INSERT INTO graphql_persisted_query
+                    (name, query, allowed, create_uid, create_date,
+                     write_uid, write_date)
+                VALUES (%s, %s, false, %s, now() at time zone 'UTC',
+                        %s, now() at time zone 'UTC')
+                ON CONFLICT (name) DO NOTHING
+                """,
+                (sha256_hash, query, self.env.uid, self.env.uid),
+            )
+            if not cr.rowcount:
+                return
+            cr.execute(
+                """
+                DELETE FROM graphql_persisted_query
+                WHERE id IN (
+                    SELECT id FROM graphql_persisted_query
+                    WHERE NOT allowed
+                    ORDER BY id DESC
+                    OFFSET %s
+                )
+                """,
+                (max_registered,),
+            )
@@ -1,2 +1,4 @@
 from . import test_controller
 from . import test_graphene
+from . import test_backend
+from . import test_benchmark
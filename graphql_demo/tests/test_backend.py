@@ -0,0 +1,61 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+from odoo.tests import TransactionCase
+
+from odoo.addons.graphql_base.backend import LRUCachedBackend
+
+from ..schema import schema
+
+QUERY = "{ allPartners(companiesOnly: true) { name } }"
+
+
+class TestLRUCachedBackend(TransactionCase):
+    def test_cached_document(self):
+        backend = LRUCachedBackend()
+        document = backend.document_from_string(schema, QUERY)
+        self.assertEqual(backend.stats()["misses"], 1)
+        self.assertIs(backend.document_from_string(schema, QUERY), document)
+        self.assertEqual(
+            backend.stats(),
+            {"hits": 1, "misses": 1, "entries": 1, "size": len(QUERY)},
+        )
+        result = document.execute(context={"env": self.env})
+        self.assertFalse(result.errors)
+        expected = self.env["res.partner"].search([("is_company", "=", True)])
+        self.assertEqual(
+            {r["name"] for r in result.data["allPartners"]},
+            set(expected.mapped("name")),
+        )
+
+    def test_invalid_document(self):
+        backend = LRUCachedBackend()
+        document = backend.document_from_string(schema, "{ allPartners { foo } }")
+        result = document.execute(context={"env": self.env})
+        self.assertTrue(result.invalid)
+        self.assertTrue(result.errors)
+        # the invalid documents are not cached
+        backend.document_from_string(schema, "{ allPartners { foo } }")
+        self.assertEqual(backend.stats()["misses"], 2)
+        self.assertEqual(backend.stats()["entries"], 0)
+
+    def test_eviction(self):
+        backend = LRUCachedBackend(max_entries=2)
+        queries = ["{ allPartners { name } }", "{ allPartners { email } }"]
+        for query in queries:
+            backend.document_from_string(schema, query)
+        # the first query becomes the most recently used one
+        backend.document_from_string(schema, queries[0])
+        backend.document_from_string(schema, "{ allPartners { contacts { name } } }")
+        backend.document_from_string(schema, queries[0])
+        self.assertEqual(backend.stats()["hits"], 2)
+        backend.document_from_string(schema, queries[1])
+        self.assertEqual(backend.stats()["misses"], 4)
+        self.assertEqual(backend.stats()["entries"], 2)
+
+    def test_max_size(self):
+        backend = LRUCachedBackend(max_size=len(QUERY) + 10)
+        backend.document_from_string(schema, QUERY)
+        backend.document_from_string(schema, "{ allPartners { email } }")
+        self.assertEqual(backend.stats()["entries"], 1)
+        self.assertLessEqual(backend.stats()["size"], len(QUERY) + 10)
@@ -0,0 +1,159 @@
+# Copyright 2018 ACSONE SA/NV
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import logging
+import time
+import tracemalloc
+
+from odoo.tests import HttpCase, tagged
+from odoo.tests.common import HOST, PORT
+
+_logger = logging.getLogger(__name__)
+
+# number of companies returned by the queries
+SIZES = (10, 100, 500)
+CONTACTS_BY_COMPANY = 2
+ITERATIONS = 5
+
+QUERIES = {
+    "names": """
+        query($limit: Int) {
+            allPartners(companiesOnly: true, limit: $limit) {
+                name
+            }
+        }
+    """,
+    "country": """
+        query($limit: Int) {
+            allPartners(companiesOnly: true, limit: $limit) {
+                name
+                country { code name }
+            }
+        }
+    """,
+    "contacts": """
+        query($limit: Int) {
+            allPartners(companiesOnly: true, limit: $limit) {
+                name
+                contacts {
+                    name
+                    email
+                    country { code name }
+                }
+            }
+        }
+    """,
+}
+
+
+class QueryCounter(object):
+    """Count the queries executed on a cursor (and on the test cursors
+    wrapping it)"""
+
+    def __init__(self, cr):
+        self.cr = cr
+        self.count = 0
+
+    def __enter__(self):
+        execute = self.cr.execute
+
+        def counted_execute(*args, **kwargs):
+            self.count += 1
+            return execute(*args, **kwargs)
+
+        self.cr.execute = counted_execute
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        del self.cr.execute
+
+
+@tagged("-standard", "benchmark")
+class TestBenchmark(HttpCase):
+    """Latency, peak memory and number of SQL queries of representative
+    queries by number of returned partners. Run them with
+    ``--test-tags benchmark``."""
+
+    def setUp(self):
+        super(TestBenchmark, self).setUp()
+        countries = self.env["res.country"].search([], limit=10)
+        companies = self.env["res.partner"].create(
+            [
+                {
+                    "name": "Benchmark company %04d" % i,
+                    "is_company": True,
+                    "country_id": countries[i % len(countries)].id,
+                }
+                for i in range(max(SIZES))
+            ]
+        )
+        self.env["res.partner"].create(
+            [
+                {
+                    "name": "Benchmark contact %04d-%d" % (i, j),
+                    "email": "contact%d-%d@example.com" % (i, j),
+                    "parent_id": company.id,
+                    "country_id": company.country_id.id,
+                }
+                for i, company in enumerate(companies)
+                for j in range(CONTACTS_BY_COMPANY)
+            ]
+        )
+        self.authenticate("admin", "admin")
+
+    def _post_query(self, query, limit):
+        response = self.opener.post(
+            "http://{}:{}/graphql/demo".format(HOST, PORT),
+            json={"query": query, "variables": {"limit": limit}},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("errors", response.json())
+        return response
+
+    def _measure(self, query, limit):
+        # warm up the caches
+        self._post_query(query, limit)
+        durations = []
+        for __ in range(ITERATIONS):
+            start = time.perf_counter()
+            self._post_query(query, limit)
+            durations.append(time.perf_counter() - start)
+        durations.sort()
+        # the requests are processed by a thread of this process, their
+        # queries are executed on the cursor of the test
+        with QueryCounter(self.cr) as counter:
+            self._post_query(query, limit)
+        # tracemalloc slows down the request, the memory is measured apart
+        tracemalloc.start()
+        try:
+            self._post_query(query, limit)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {
+            "p50_ms": durations[len(durations) // 2] * 1000,
+            "max_ms": durations[-1] * 1000,
+            "queries": counter.count,
+            "peak_kb": peak / 1024.0,
+        }
+
+    def test_benchmark(self):
+        lines = [
+            "%-10s %6s %10s %10s %8s %10s"
+            % ("query", "size", "p50 ms", "max ms", "queries", "peak KB")
+        ]
+        for name, query in QUERIES.items():
+            for size in SIZES:
+                result = self._measure(query, size)
+                lines.append(
+                    "%-10s %6d %10.1f %10.1f %8d %10.1f"
+                    % (
+                        name,
+                        size,
+                        result["p50_ms"],
+                        result["max_ms"],
+                        result["queries"],
+                        result["peak_kb"],
+                    )
+                )
+        _logger.info("GraphQL benchmarks\n%s", "\n".join(lines))
@@ -2,6 +2,7 @@
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
 import json
+from unittest import mock
 
 from werkzeug.urls import url_encode
 
@@ -9,6 +10,10 @@ from odoo.tests import HttpCase
 from odoo.tests.common import HOST, PORT
 from odoo.tools import mute_logger
 
+from odoo.addons.graphql_base.models.graphql_persisted_query import query_hash
+
+from ..controllers.main import GraphQLController
+
 
 class TestController(HttpCase):
     def url_open_json(self, url, json):
@@ -154,3 +159,147 @@ class TestController(HttpCase):
         self.assertEqual(
             len(self.env["res.partner"].search([("email", "=", "toto@example.com")])), 0
         )
+
+    def _persisted_query_extensions(self, query):
+        return {"persistedQuery": {"version": 1, "sha256Hash": query_hash(query)}}
+
+    @mock.patch.object(GraphQLController, "_persisted_queries", "auto")
+    def test_persisted_query(self):
+        self.authenticate("admin", "admin")
+        query = "{allPartners(companiesOnly: true){name}}"
+        extensions = self._persisted_query_extensions(query)
+        r = self.url_open_json("/graphql/demo", {"extensions": extensions})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(
+            r.json()["errors"][0]["extensions"]["code"], "PERSISTED_QUERY_NOT_FOUND"
+        )
+        # the client sends the query with its hash to register it
+        r = self.url_open_json(
+            "/graphql/demo", {"query": query, "extensions": extensions}
+        )
+        self.assertEqual(r.status_code, 200)
+        self._check_all_partners(r.json()["data"]["allPartners"], companies_only=True)
+        persisted_query = self.env["graphql.persisted.query"].search(
+            [("name", "=", query_hash(query))]
+        )
+        self.assertEqual(persisted_query.query, query)
+        self.assertFalse(persisted_query.allowed)
+        # then the query is sent with its hash only, through a GET
+        data = {"extensions": json.dumps(extensions)}
+        r = self.url_open("/graphql/demo?" + url_encode(data))
+        self.assertEqual(r.status_code, 200)
+        self._check_all_partners(r.json()["data"]["allPartners"], companies_only=True)
+
+    @mock.patch.object(GraphQLController, "_persisted_queries", "auto")
+    def test_persisted_query_not_registered_if_invalid(self):
+        self.authenticate("admin", "admin")
+        query = "{allPartners{foo}}"
+        extensions = self._persisted_query_extensions(query)
+        r = self.url_open_json(
+            "/graphql/demo", {"query": query, "extensions": extensions}
+        )
+        self.assertEqual(r.status_code, 400)
+        self.assertFalse(
+            self.env["graphql.persisted.query"].search(
+                [("name", "=", query_hash(query))]
+            )
+        )
+
+    def test_persisted_query_disabled(self):
+        self.authenticate("admin", "admin")
+        query = "{allPartners{name}}"
+        extensions = self._persisted_query_extensions(query)
+        r = self.url_open_json(
+            "/graphql/demo", {"query": query, "extensions": extensions}
+        )
+        self.assertEqual(r.status_code, 200)
+        self.assertFalse(
+            self.env["graphql.persisted.query"].search(
+                [("name", "=", query_hash(query))]
+            )
+        )
+
+    @mock.patch.object(GraphQLController, "_persisted_queries", "auto")
+    def test_persisted_query_hash_mismatch(self):
+        self.authenticate("admin", "admin")
+        extensions = self._persisted_query_extensions("{allPartners{email}}")
+        r = self.url_open_json(
+            "/graphql/demo", {"query": "{allPartners{name}}", "extensions": extensions}
+        )
+        self.assertEqual(r.status_code, 400)
+        self.assertFalse(
+            self.env["graphql.persisted.query"].search(
+                [("name", "=", extensions["persistedQuery"]["sha256Hash"])]
+            )
+        )
+
+    def test_persisted_query_allow_list(self):
+        self.authenticate("admin", "admin")
+        allowed = "{allPartners{name}}"
+        self.env["graphql.persisted.query"].create({"query": allowed})
+        with mock.patch.object(GraphQLController, "_persisted_queries", "allow_list"):
+            r = self.url_open("/graphql/demo?" + url_encode({"query": allowed}))
+            self.assertEqual(r.status_code, 200)
+            self._check_all_partners(r.json()["data"]["allPartners"])
+            extensions = self._persisted_query_extensions(allowed)
+            data = {"extensions": json.dumps(extensions)}
+            r = self.url_open("/graphql/demo?" + url_encode(data))
+            self.assertEqual(r.status_code, 200)
+            self._check_all_partners(r.json()["data"]["allPartners"])
+            # the other queries are rejected, even with their hash
+            query = "{allPartners{email}}"
+            extensions = self._persisted_query_extensions(query)
+            r = self.url_open_json(
+                "/graphql/demo", {"query": query, "extensions": extensions}
+            )
+            self.assertEqual(r.status_code, 403)
+            r = self.url_open("/graphql/demo?" + url_encode({"query": query}))
+            self.assertEqual(r.status_code, 403)
+        self.assertFalse(
+            self.env["graphql.persisted.query"].search(
+                [("name", "=", query_hash(query))]
+            )
+        )
+
+    @mute_logger("graphql.execution.executor", "graphql.execution.utils")
+    def test_post_json_batch(self):
+        self.authenticate("admin", "admin")
+        mutation = """
+            mutation($name: String!, $email: String!, $raise: Boolean) {
+                createPartner(
+                    name: $name, email: $email, raiseAfterCreate: $raise
+                ) {
+                    name
+                }
+            }
+        """
+        data = [
+            {"query": "{allPartners{name}}"},
+            {
+                "query": mutation,
+                "variables": {"name": "Toto", "email": "toto@example.com"},
+            },
+            {
+                "query": mutation,
+                "variables": {
+                    "name": "Titi",
+                    "email": "titi@example.com",
+                    "raise": True,
+                },
+            },
+            {"query": "{allPartners{foo}}"},
+        ]
+        r = self.url_open_json("/graphql/demo", data)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.headers["Content-Type"], "application/json")
+        results = r.json()
+        self.assertEqual(len(results), 4)
+        self._check_all_partners(results[0]["data"]["allPartners"])
+        self.assertEqual(results[1]["data"]["createPartner"]["name"], "Toto")
+        self.assertIn("as requested", results[2]["errors"][0]["message"])
+        self.assertTrue(results[3]["errors"])
+        # only the failed operation has been rolled back
+        partners = self.env["res.partner"].search(
+            [("email", "in", ("toto@example.com", "titi@example.com"))]
+        )
+        self.assertEqual(partners.mapped("name"), ["Toto"])